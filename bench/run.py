@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the search -> filter -> resolve -> add pipeline.
+
+Starts the stubs from stubs.py in a child process, points jackett-search and
+query.py at them and reports latency percentiles per stage plus the peak RSS
+of this process (the app side only).
+
+    ./bench/run.py --results 10000 --iterations 20
+    ./bench/run.py --json before.json
+    ./bench/run.py --baseline before.json  # exits 1 when a p95 regressed
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import stubs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _serve(config, ports):
+    ports.put(stubs.serve(config))
+    while True:
+        time.sleep(3600)
+
+
+def start_stubs(config):
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(config, ports), daemon=True)
+    process.start()
+    return process, ports.get(timeout=10)
+
+
+def configure(ports, workdir):
+    """Environment for the app, read by its modules at import time"""
+    jackett, _, transmission = ports
+    os.environ.update({
+        "JACKETT_URL": f"http://127.0.0.1:{jackett}",
+        "JACKETT_API_KEY": "bench",
+        "TRANSMISSION_HOST": "127.0.0.1",
+        "TRANSMISSION_PORT": str(transmission),
+        "MAGNET_CACHE_PATH": os.path.join(workdir, "magnets.sqlite3"),
+        "HISTORY_PATH": os.path.join(workdir, "history.sqlite3"),
+        "WATCH_PATH": os.path.join(workdir, "watches.sqlite3"),
+        "WATCH_ENABLED": "0",
+        "HISTORY_REFRESH": "0",
+    })
+    # Prefetching would warm the magnet cache behind the resolve stage's back
+    os.environ.setdefault("PREFETCH_TOP", "0")
+    sys.path.insert(0, os.path.join(ROOT, "jackett-search"))
+    sys.path.insert(0, ROOT)
+
+
+class Bench:
+    def __init__(self):
+        self.samples = {}
+        self.rss = {}
+
+    def time(self, stage, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        self.samples.setdefault(stage, []).append((time.perf_counter() - started) * 1000)
+        self.rss[stage] = peak_rss_mb()
+        return result
+
+    def report(self):
+        stages = {}
+        for stage, samples in self.samples.items():
+            stages[stage] = {
+                "n": len(samples),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "max": max(samples),
+                "peak_rss_mb": self.rss[stage],
+            }
+        return {"stages": stages, "peak_rss_mb": peak_rss_mb()}
+
+
+def run(args):
+    import app
+    import jackett
+    import query
+    from ranking import RankedResults
+    from resolver import direct_magnet, resolve_magnet
+
+    query.API_URL = jackett.API_URL
+    client = app.app.test_client()
+    bench = Bench()
+
+    def search_and_render(q):
+        response = client.post("/", data={"query": q, "min_seeders": "1"})
+        assert response.status_code == 302, response.status_code
+        page = client.get(response.location)
+        assert page.status_code == 200
+        return response.location.split("sid=")[1]
+
+    def stream(q):
+        body = client.get("/search/stream", query_string={"query": q}).get_data(as_text=True)
+        assert "event: done" in body or args.fail, body[-300:]
+
+    def add(sid, ids):
+        response = client.post("/add_magnets", json={"sid": sid, "ids": ids})
+        assert response.status_code == 200, response.get_json()
+
+    def query_cli(q):
+        RankedResults(q, min_seeders=1).add(query.search(q))
+
+    def filter_rank(entries):
+        RankedResults("stub", min_size=0.5, min_seeders=1).add(entries)
+
+    sids = []
+    for k in range(args.iterations):
+        sids.append(bench.time("search_to_render", search_and_render, f"bench {k}"))
+    for k in range(args.iterations):
+        bench.time("search_stream", stream, f"stream {k}")
+    for sid in sids:
+        bench.time("page_render", client.get, f"/?sid={sid}&page=2")
+        bench.time("api_sorted_page", client.get, f"/api/search?limit=50&cursor={app.encode_cursor(sid, 'size', None, 50)}")
+    for k in range(args.iterations):
+        bench.time("query_py", query_cli, f"cli {k}")
+    for k in range(args.iterations):
+        bench.time("filter_rank", filter_rank, jackett.fetch_results(f"stub {k}"))
+
+    # Cold lookups go to the tracker stub, the second pass is served by the cache
+    entries = [
+        item["entry"] for item in app.result_sessions.get(sids[0])["items"]
+        if not direct_magnet(item["entry"])
+    ][:args.resolves]
+    for entry in entries:
+        bench.time("resolve_cold", resolve_magnet, entry)
+    for entry in entries:
+        bench.time("resolve_cached", resolve_magnet, entry)
+
+    for k, sid in enumerate(sids):
+        bench.time("add_batch", add, sid, list(range(k * args.batch, (k + 1) * args.batch)))
+
+    return bench.report()
+
+
+def print_report(report, baseline=None):
+    print(f"{'stage':<18}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'rss MB':>9}")
+    for stage, s in report["stages"].items():
+        line = (f"{stage:<18}{s['n']:>5}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}"
+                f"{s['max']:>10.1f}{s['peak_rss_mb']:>9.1f}")
+        if baseline and stage in baseline["stages"]:
+            line += f"  p95 {s['p95'] / max(baseline['stages'][stage]['p95'], 1e-9) - 1:+.0%}"
+        print(line)
+    print(f"peak RSS {report['peak_rss_mb']:.1f} MB")
+
+
+def regressions(report, baseline, tolerance):
+    """Stages whose p95 grew by more than tolerance over the baseline"""
+    return [
+        stage for stage, s in report["stages"].items()
+        if stage in baseline["stages"] and s["p95"] > baseline["stages"][stage]["p95"] * (1 + tolerance)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline jackett-search and query.py benchmark")
+    stubs.add_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=10, help="Searches per stage")
+    parser.add_argument("--resolves", type=int, default=50, help="Link entries resolved per pass")
+    parser.add_argument("--batch", type=int, default=10, help="Results per bulk add")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth over the baseline")
+    args = parser.parse_args()
+
+    process, ports = start_stubs(stubs.config_from(args))
+    with tempfile.TemporaryDirectory(prefix="jackett-bench-") as workdir:
+        configure(ports, workdir)
+        report = run(args)
+    process.terminate()
+
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "tolerance")}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if baseline:
+        slower = regressions(report, baseline, args.tolerance)
+        if slower:
+            print(f"p95 regressed more than {args.tolerance:.0%}: {', '.join(slower)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Jackett, tracker download links and Transmission RPC.
+
+Results are generated per query from a fixed seed, so the same query always
+returns the same torrents. Titles contain the query words so the app's
+filters keep them.
+
+    ./bench/stubs.py --results 10000 --indexers 4 --latency 0.2 --fail 0.1
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+
+class Config:
+    def __init__(self, results=1000, indexers=4, latency=0.0, fail=0.0, magnet_ratio=0.5,
+                 tracker_latency=0.0, rpc_latency=0.0):
+        self.results = results  # entries per query across all indexers
+        self.indexers = indexers
+        self.latency = latency  # seconds per Jackett request
+        self.fail = fail  # fraction of Jackett requests answered with HTTP 500
+        self.magnet_ratio = magnet_ratio  # fraction of entries carrying a MagnetUri
+        self.tracker_latency = tracker_latency  # seconds per Link redirect
+        self.rpc_latency = rpc_latency  # seconds per Transmission call
+        self.tracker_url = None
+
+
+def infohash(query, i):
+    return hashlib.sha1(f"{query}:{i}".encode()).hexdigest()
+
+
+def magnet(hash_, title):
+    return f"magnet:?xt=urn:btih:{hash_}&dn={quote(title)}"
+
+
+def generate(config, query, indexer=None):
+    """Jackett-shaped entries for a query, only one indexer's share when given"""
+    rng = random.Random(query)
+    entries = []
+    for n in range(config.results):
+        owner = n % config.indexers
+        # Every value is drawn for every entry so each indexer's share matches the aggregate
+        seeders = int(rng.paretovariate(1.2)) - 1
+        peers = seeders + rng.randrange(50)
+        size = int(rng.lognormvariate(21.5, 1.2))
+        published = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(1.6e9 + rng.random() * 1e8))
+        quality = f"{rng.choice(('720p', '1080p', '2160p'))} {rng.choice(('WEB', 'BluRay', 'HDTV'))}"
+        with_magnet = rng.random() < config.magnet_ratio
+        if indexer is not None and owner != indexer:
+            continue
+        # A quarter of the torrents are also listed by the next indexer, like in real results
+        i = n - 1 if n % 4 == 1 else n
+        title = f"{query} {i} {quality}"
+        hash_ = infohash(query, i)
+        entry = {
+            "Title": title,
+            "Tracker": f"stub{owner}",
+            "Size": size,
+            "Seeders": seeders,
+            "Peers": peers,
+            "PublishDate": published,
+            "Guid": f"{config.tracker_url}/details/{hash_}",
+        }
+        if with_magnet:
+            entry["MagnetUri"] = magnet(hash_, title)
+            entry["InfoHash"] = hash_
+        else:
+            entry["Link"] = f"{config.tracker_url}/dl/{hash_}?dn={quote(title)}"
+        entries.append(entry)
+    return entries
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (--limit, a closed SSE stream) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _handler(config, route):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out as two writes, Nagle would hold the body back
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            route(self, config)
+
+        def do_POST(self):
+            route(self, config)
+
+        def send(self, status, body=b"", content_type="application/json", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def jackett_route(handler, config):
+    url = urlparse(handler.path)
+    params = parse_qs(url.query)
+    time.sleep(config.latency)
+    if params.get("t") == ["indexers"]:
+        indexers = "".join(
+            f'<indexer id="stub{i}" configured="true"><title>Stub {i}</title></indexer>'
+            for i in range(config.indexers)
+        )
+        return handler.send(200, f"<indexers>{indexers}</indexers>".encode(), "application/xml")
+    if random.random() < config.fail:
+        return handler.send(500, b'{"error": "injected failure"}')
+    parts = url.path.strip("/").split("/")  # api/v2.0/indexers/<id>/results
+    if len(parts) != 5 or parts[4] != "results":
+        return handler.send(404)
+    query = params.get("Query", [""])[0]
+    indexer = None if parts[3] == "all" else int(parts[3].removeprefix("stub"))
+    handler.send(200, json.dumps({"Results": generate(config, query, indexer)}).encode())
+
+
+def tracker_route(handler, config):
+    url = urlparse(handler.path)
+    if not url.path.startswith("/dl/"):
+        return handler.send(404)
+    time.sleep(config.tracker_latency)
+    title = parse_qs(url.query).get("dn", [""])[0]
+    handler.send(302, headers={"Location": magnet(url.path.removeprefix("/dl/"), title)})
+
+
+class Transmission:
+    """Transmission RPC with the 409 session handshake and an in-memory torrent list"""
+
+    session_id = "bench-session"
+
+    def __init__(self):
+        self.torrents = {}
+        self.lock = threading.Lock()
+
+    def route(self, handler, config):
+        # Read the body either way, keep-alive connections are reused after a 409
+        body = json.loads(handler.rfile.read(int(handler.headers.get("Content-Length", 0))) or b"{}")
+        if handler.headers.get("X-Transmission-Session-Id") != self.session_id:
+            return handler.send(409, headers={"X-Transmission-Session-Id": self.session_id})
+        time.sleep(config.rpc_latency)
+        arguments = body.get("arguments", {})
+        if body.get("method") == "torrent-get":
+            # Only the requested fields, like Transmission, so clients relying on one notice
+            fields = arguments.get("fields")
+            with self.lock:
+                torrents = [
+                    {k: v for k, v in t.items() if fields is None or k in fields} for t in self.torrents.values()
+                ]
+            return self._reply(handler, {"torrents": torrents})
+        if body.get("method") == "torrent-add":
+            params = parse_qs(urlparse(arguments.get("filename", "")).query)
+            hash_ = params.get("xt", [""])[0].split(":")[-1]
+            with self.lock:
+                known = hash_ in self.torrents
+                if not known:
+                    self.torrents[hash_] = self._torrent(len(self.torrents) + 1, hash_, params.get("dn", [hash_])[0])
+                torrent_id = self.torrents[hash_]["id"]
+            key = "torrent-duplicate" if known else "torrent-added"
+            return self._reply(handler, {key: {"id": torrent_id, "hashString": hash_}})
+        self._reply(handler, {}, result="method not recognized")
+
+    @staticmethod
+    def _torrent(torrent_id, hash_, name):
+        return {
+            "id": torrent_id, "hashString": hash_, "name": name, "status": 4, "percentDone": 0.0,
+            "rateDownload": 0, "rateUpload": 0, "eta": -1, "sizeWhenDone": 0, "uploadRatio": 0.0,
+            "error": 0, "errorString": "", "addedDate": int(time.time()), "downloadDir": "/downloads",
+        }
+
+    def _reply(self, handler, arguments, result="success"):
+        handler.send(200, json.dumps({"result": result, "arguments": arguments}).encode())
+
+
+def serve(config, jackett_port=0, tracker_port=0, transmission_port=0):
+    """Start the three stubs in daemon threads, returns their (jackett, tracker, transmission) ports"""
+    servers = [
+        _Server(("127.0.0.1", tracker_port), _handler(config, tracker_route)),
+        _Server(("127.0.0.1", jackett_port), _handler(config, jackett_route)),
+        _Server(("127.0.0.1", transmission_port), _handler(config, Transmission().route)),
+    ]
+    config.tracker_url = f"http://127.0.0.1:{servers[0].server_address[1]}"
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    tracker, jackett, transmission = (server.server_address[1] for server in servers)
+    return jackett, tracker, transmission
+
+
+def add_arguments(parser):
+    parser.add_argument("--results", type=int, default=1000, help="Entries per query")
+    parser.add_argument("--indexers", type=int, default=4, help="Configured stub indexers")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per Jackett request")
+    parser.add_argument("--fail", type=float, default=0.0, help="Fraction of Jackett requests that fail")
+    parser.add_argument("--magnet-ratio", type=float, default=0.5, help="Fraction of entries with a MagnetUri")
+    parser.add_argument("--tracker-latency", type=float, default=0.0, help="Seconds per Link redirect")
+    parser.add_argument("--rpc-latency", type=float, default=0.0, help="Seconds per Transmission call")
+
+
+def config_from(args):
+    return Config(args.results, args.indexers, args.latency, args.fail, args.magnet_ratio,
+                  args.tracker_latency, args.rpc_latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Jackett, tracker and Transmission servers")
+    add_arguments(parser)
+    parser.add_argument("--jackett-port", type=int, default=9117)
+    parser.add_argument("--tracker-port", type=int, default=9118)
+    parser.add_argument("--transmission-port", type=int, default=9091)
+    args = parser.parse_args()
+
+    ports = serve(config_from(args), args.jackett_port, args.tracker_port, args.transmission_port)
+    print("Jackett http://127.0.0.1:{}  tracker http://127.0.0.1:{}  Transmission http://127.0.0.1:{}".format(*ports))
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
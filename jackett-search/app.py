@@ -1,422 +1,53 @@
 #!/usr/bin/env python3
 import os
+import json
+import math
+import base64
+import secrets
+import time
 import requests
-from flask import Flask, request, render_template_string, redirect, url_for, flash
+from flask import Flask, Response, g, request, render_template, redirect, url_for, flash, jsonify, stream_with_context
+from resolver import direct_magnet, prefetch, resolve_magnet, resolve_many, UNRESOLVED
+from caching import LRUCache
+from magnet_cache import infohash_from_magnet
+from http_pool import session
+from jackett import API_KEY, indexers_cache, search, search_cache, search_history, search_streaming
+import magnet_cache
+import metrics
+from ranking import RankedResults, SORT_KEYS, sort_items
+from transmission import TransmissionClient, TransmissionError
+from downloads import DownloadsTable
+import watcher
 
-API_URL = "http://127.0.0.1:9117/api/v2.0/indexers/all/results"
-API_KEY = os.getenv("JACKETT_API_KEY")
+# Transmission RPC configuration (using localhost since Docker runs with --network host)
+TRANSMISSION_HOST = os.getenv('TRANSMISSION_HOST', '127.0.0.1')
+TRANSMISSION_PORT = os.getenv('TRANSMISSION_PORT', '9091')
+TRANSMISSION_URL = f"http://{TRANSMISSION_HOST}:{TRANSMISSION_PORT}/transmission/rpc"
+
+PAGE_SIZE = 20
+API_MAX_LIMIT = 100
+RESULT_SESSIONS = int(os.getenv("RESULT_SESSIONS", 32))  # searches kept for paging and redirects
+RESULT_SESSION_TTL = float(os.getenv("RESULT_SESSION_TTL", 3600))  # seconds
+SHOW_TIMINGS = os.getenv("SHOW_TIMINGS", "0") == "1"  # per-stage timings on every results page, else with ?timing=1
 
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'dev-key-change-in-production')
+# CSS and JS are cached by browsers, only the small page itself is rendered per request
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 86400
 
-TEMPLATE = """
-<!doctype html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Jackett Torrent Search</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        
-        .container {
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }
-        
-        .header {
-            background: linear-gradient(135deg, #2c3e50 0%, #34495e 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }
-        
-        .header h1 {
-            font-size: 2.5rem;
-            margin-bottom: 10px;
-            font-weight: 300;
-        }
-        
-        .header p {
-            opacity: 0.8;
-            font-size: 1.1rem;
-        }
-        
-        .search-section {
-            padding: 30px;
-            background: #f8f9fa;
-        }
-        
-        .search-form {
-            display: grid;
-            grid-template-columns: 2fr 1fr 1fr 1fr auto;
-            gap: 15px;
-            align-items: end;
-        }
-        
-        .form-group {
-            display: flex;
-            flex-direction: column;
-        }
-        
-        .form-group label {
-            font-weight: 600;
-            margin-bottom: 5px;
-            color: #2c3e50;
-            font-size: 0.9rem;
-        }
-        
-        .form-group input {
-            padding: 12px 15px;
-            border: 2px solid #e1e8ed;
-            border-radius: 8px;
-            font-size: 1rem;
-            transition: all 0.3s ease;
-        }
-        
-        .form-group input:focus {
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-        }
-        
-        .search-btn {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            padding: 12px 30px;
-            border-radius: 8px;
-            font-size: 1rem;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            height: fit-content;
-        }
-        
-        .search-btn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 10px 20px rgba(102, 126, 234, 0.3);
-        }
-        
-        .search-btn:active {
-            transform: translateY(0);
-        }
-        
-        
-        .results-section {
-            padding: 30px;
-        }
-        
-        .results-header {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 20px;
-            padding-bottom: 15px;
-            border-bottom: 2px solid #e1e8ed;
-        }
-        
-        .results-count {
-            font-size: 1.1rem;
-            color: #2c3e50;
-            font-weight: 600;
-        }
-        
-        .torrent-item {
-            background: white;
-            border: 1px solid #e1e8ed;
-            border-radius: 12px;
-            padding: 20px;
-            margin-bottom: 15px;
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .torrent-item:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-            border-color: #667eea;
-        }
-        
-        .torrent-title {
-            font-size: 1.2rem;
-            font-weight: 600;
-            color: #2c3e50;
-            margin-bottom: 10px;
-            line-height: 1.4;
-        }
-        
-        .torrent-meta {
-            display: flex;
-            gap: 20px;
-            margin-bottom: 15px;
-            flex-wrap: wrap;
-        }
-        
-        .meta-item {
-            display: flex;
-            align-items: center;
-            gap: 5px;
-            color: #6c757d;
-            font-size: 0.9rem;
-        }
-        
-        .meta-item strong {
-            color: #2c3e50;
-        }
-        
-        .seeders {
-            color: #28a745 !important;
-        }
-        
-        .peers {
-            color: #17a2b8 !important;
-        }
-        
-        .size {
-            color: #fd7e14 !important;
-        }
-        
-        .add-btn {
-            background: linear-gradient(135deg, #28a745 0%, #20c997 100%);
-            color: white;
-            border: none;
-            padding: 10px 20px;
-            border-radius: 8px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            font-size: 0.9rem;
-        }
-        
-        .add-btn:hover {
-            transform: translateY(-1px);
-            box-shadow: 0 5px 15px rgba(40, 167, 69, 0.3);
-        }
-        
-        .add-btn:active {
-            transform: translateY(0);
-        }
-        
-        .no-results {
-            text-align: center;
-            padding: 40px;
-            color: #6c757d;
-            font-size: 1.1rem;
-        }
-        
-        .alert {
-            padding: 15px 20px;
-            margin: 20px 30px;
-            border-radius: 8px;
-            font-weight: 500;
-        }
-        
-        .alert-success {
-            background-color: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-        
-        .alert-error {
-            background-color: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        
-        .alert-info {
-            background-color: #d1ecf1;
-            color: #0c5460;
-            border: 1px solid #bee5eb;
-        }
-        
-        @media (max-width: 768px) {
-            .search-form {
-                grid-template-columns: 1fr;
-                gap: 10px;
-            }
-            
-            .torrent-meta {
-                flex-direction: column;
-                gap: 10px;
-            }
-            
-            .header h1 {
-                font-size: 2rem;
-            }
-            
-            .container {
-                margin: 10px;
-                border-radius: 8px;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>🔍 Jackett Torrent Search</h1>
-            <p>Search and add torrents directly to Transmission</p>
-        </div>
-        
-        {% with messages = get_flashed_messages(with_categories=true) %}
-          {% if messages %}
-            {% for category, message in messages %}
-              <div class="alert alert-{{ category if category != 'message' else 'info' }}">
-                {{ message }}
-              </div>
-            {% endfor %}
-          {% endif %}
-        {% endwith %}
-        
-        <div class="search-section">
-            <form method="post" class="search-form" id="searchForm">
-                <div class="form-group">
-                    <label for="query">Search Query</label>
-                    <input name="query" id="query" placeholder="Enter search terms..." required
-                           value="{{ request.form.get('query', '') }}" autocomplete="off">
-                </div>
-                <div class="form-group">
-                    <label for="min_size">Min Size (GB)</label>
-                    <input name="min_size" id="min_size" placeholder="0.1" type="number" step="0.1"
-                           value="{{ request.form.get('min_size', '') }}">
-                </div>
-                <div class="form-group">
-                    <label for="max_size">Max Size (GB)</label>
-                    <input name="max_size" id="max_size" placeholder="10.0" type="number" step="0.1"
-                           value="{{ request.form.get('max_size', '') }}">
-                </div>
-                <div class="form-group">
-                    <label for="min_seeders">Min Seeders</label>
-                    <input name="min_seeders" id="min_seeders" placeholder="1" type="number"
-                           value="{{ request.form.get('min_seeders', '') }}">
-                </div>
-                <button type="submit" class="search-btn">Search</button>
-            </form>
-        </div>
-        
-        {% if results is not none %}
-          <div class="results-section">
-            {% if results %}
-              <div class="results-header">
-                <div class="results-count">
-                  Found {{ results|length }} torrent{{ 's' if results|length != 1 else '' }}
-                </div>
-              </div>
-              
-              {% for e in results %}
-                <div class="torrent-item">
-                  <div class="torrent-title">{{e.Title}}</div>
-                  <div class="torrent-meta">
-                    <div class="meta-item">
-                      <span>📦</span>
-                      <span class="size"><strong>{{e.SizeGB}} GB</strong></span>
-                    </div>
-                    <div class="meta-item">
-                      <span>⬆️</span>
-                      <span class="seeders"><strong>{{e.Seeders}}</strong> seeders</span>
-                    </div>
-                    <div class="meta-item">
-                      <span>👥</span>
-                      <span class="peers"><strong>{{e.Peers}}</strong> peers</span>
-                    </div>
-                  </div>
-                  <form method="post" action="/add_magnet" style="display: inline;">
-                    <input type="hidden" name="magnet" value="{{e.Magnet}}">
-                    <input type="hidden" name="title" value="{{e.Title}}">
-                    <button type="submit" class="add-btn">
-                      ➕ Add to Transmission
-                    </button>
-                  </form>
-                </div>
-              {% endfor %}
-            {% else %}
-              <div class="no-results">
-                <h3>No results found</h3>
-                <p>Try adjusting your search criteria or filters</p>
-              </div>
-            {% endif %}
-          </div>
-        {% endif %}
-    </div>
-    
-    <script>
-        // Add keyboard shortcut (Ctrl+Enter to search)
-        document.addEventListener('keydown', function(e) {
-            if ((e.ctrlKey || e.metaKey) && e.key === 'Enter') {
-                document.getElementById('searchForm').submit();
-            }
-        });
-        
-        // Auto-focus search input
-        document.getElementById('query').focus();
-    </script>
-</body>
-</html>
-"""
+# Compiled once at startup instead of on every request
+INDEX_TEMPLATE = app.jinja_env.get_template("index.html")
+DOWNLOADS_TEMPLATE = app.jinja_env.get_template("downloads.html")
 
-def human_size(b): return round(b / (1024 ** 3), 2)
+transmission = TransmissionClient(TRANSMISSION_URL, session)
 
 def add_magnet_to_transmission(magnet_url):
     """Add a magnet URL to Transmission daemon via RPC API"""
     try:
-        # Transmission RPC configuration (using localhost since Docker runs with --network host)
-        transmission_host = os.getenv('TRANSMISSION_HOST', '127.0.0.1')
-        transmission_port = os.getenv('TRANSMISSION_PORT', '9091')
-        transmission_url = f"http://{transmission_host}:{transmission_port}/transmission/rpc"
-        
-        # Get session ID first
-        session_response = requests.get(transmission_url, timeout=10)
-        session_id = session_response.headers.get('X-Transmission-Session-Id')
-        
-        if not session_id:
-            return False, "Could not get Transmission session ID"
-        
-        # Add torrent via RPC
-        rpc_data = {
-            "method": "torrent-add",
-            "arguments": {
-                "filename": magnet_url
-            }
-        }
-        
-        headers = {
-            'X-Transmission-Session-Id': session_id,
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.post(
-            transmission_url, 
-            json=rpc_data, 
-            headers=headers, 
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('result') == 'success':
-                return True, "Torrent added successfully!"
-            else:
-                return False, f"Transmission error: {result.get('result', 'Unknown error')}"
-        else:
-            return False, f"HTTP error: {response.status_code}"
-            
+        transmission.add_magnet(magnet_url)
+        return True, "Torrent added successfully!"
+    except TransmissionError as e:
+        return False, str(e)
     except requests.exceptions.Timeout:
         return False, "Timeout while connecting to Transmission"
     except requests.exceptions.ConnectionError:
@@ -424,134 +55,576 @@ def add_magnet_to_transmission(magnet_url):
     except Exception as e:
         return False, f"Error: {str(e)}"
 
-def resolve_magnet(entry):
-    if entry.get("MagnetUri"): 
-        return entry["MagnetUri"]
-    if entry.get("Guid", "").startswith("magnet:?"): 
-        return entry["Guid"]
-    if entry.get("Link"):
-        try:
-            r = requests.get(entry["Link"], allow_redirects=False, timeout=10)
-            if r.headers.get("Location", "").startswith("magnet:?"):
-                return r.headers["Location"]
-        except Exception:
-            return None
-    return None
+def plan_additions(magnets, existing):
+    """
+    Check magnets against the infohashes already in Transmission and each other.
 
-def search(query):
-    if not API_KEY:
-        raise ValueError("JACKETT_API_KEY environment variable is not set")
-    
+    Returns one {"magnet", "infohash", "status", "message"} per magnet where
+    status is exists, duplicate or invalid, or None for magnets to submit.
+    """
+    seen = set()
+    plan = []
+    for magnet in magnets:
+        infohash = infohash_from_magnet(magnet)
+        item = {"magnet": magnet, "infohash": infohash, "status": None, "message": None}
+        if not magnet or not magnet.startswith("magnet:?"):
+            item.update(status="invalid", message="Invalid magnet URL format")
+        elif infohash in existing:
+            item.update(status="exists", message="Already in Transmission")
+        elif infohash in seen:
+            item.update(status="duplicate", message="Repeated in this batch")
+        if infohash:
+            seen.add(infohash)
+        plan.append(item)
+    return plan
+
+def add_magnets_to_transmission(magnets):
+    """
+    Add many magnets, skipping those already in Transmission or repeated in the batch.
+
+    Existing torrents come from one cached torrent-get snapshot. Returns one
+    result per magnet as in plan_additions() with status added or failed for
+    the submitted ones.
+    """
     try:
-        r = requests.get(API_URL, params={"apikey": API_KEY, "Query": query}, timeout=120)
-        r.raise_for_status()
-        return r.json().get("Results", [])
-    except requests.exceptions.Timeout:
-        raise Exception("Jackett API request timed out")
-    except requests.exceptions.ConnectionError:
-        raise Exception("Could not connect to Jackett API")
-    except requests.exceptions.HTTPError as e:
-        raise Exception(f"Jackett API error: {e}")
+        existing = transmission.torrent_hashes()
     except Exception as e:
-        raise Exception(f"Search error: {str(e)}")
+        # Still add, Transmission itself reports torrents it already has
+        print(f"Could not list Transmission torrents: {e}")
+        existing = {}
+    
+    plan = plan_additions(magnets, existing)
+    for item in plan:
+        if item["status"] is None:
+            success, message = add_magnet_to_transmission(item["magnet"])
+            item.update(status="added" if success else "failed", message=message)
+    return plan
+
+downloads = DownloadsTable(transmission)
+
+# Started by the server entry points below and in asgi.py, never on import
+watches = watcher.Watcher(add_magnets_to_transmission)
+
+result_sessions = LRUCache(RESULT_SESSIONS, ttl=RESULT_SESSION_TTL)
+
+def save_session(sid, form, ranked, timings=None):
+    """Keep the full ranked result list of a search under its id"""
+    result_sessions.put(sid, {
+        "form": form, "items": list(ranked.items), "by_id": dict(ranked.by_id), "timings": timings or {},
+    })
+
+def new_session(form, ranked, timings=None):
+    sid = secrets.token_urlsafe(8)
+    save_session(sid, form, ranked, timings)
+    return sid
+
+def session_items(sid, ids):
+    """
+    Look up stored results by Id for bulk adds.
+
+    Returns (items, failed) where items are (id, item) pairs and failed holds
+    per-id results for unknown ids, or None if the search expired.
+    """
+    saved = result_sessions.get(sid)
+    if saved is None:
+        return None
+    items = [(item_id, saved["by_id"].get(item_id)) for item_id in ids]
+    failed = [
+        {"id": item_id, "status": "invalid", "message": "Unknown result id"}
+        for item_id, item in items if item is None
+    ]
+    return [(item_id, item) for item_id, item in items if item is not None], failed
+
+def to_results(items):
+    """
+    Shape ranked items for display without resolving anything.
+
+    Each result carries its stable Id in the search session, /add_magnet looks
+    the entry up there and resolves its magnet only then.
+    """
+    return [{
+        "Id": item["Id"],
+        "Title": item["Title"],
+        "SizeGB": item["SizeGB"],
+        "Seeders": item["Seeders"],
+        "Peers": item["Peers"],
+        "Sources": item["Sources"],
+        "Magnet": direct_magnet(item["entry"]),
+        "PublishDate": item["entry"].get("PublishDate")
+    } for item in items]
+
+def render_index(form=None, results=None, sid=None, page=1, pages=1, total=0, timings=None):
+    with metrics.timed("render"):
+        return render_template(
+            INDEX_TEMPLATE, form=form or {}, results=results, sid=sid, page=page, pages=pages, total=total,
+            timings=timings, show_timings=show_timings()
+        )
+
+def show_timings():
+    return SHOW_TIMINGS or request.args.get("timing") == "1"
+
+def search_form(args):
+    return {k: (args.get(k) or "").strip() for k in ("query", "min_size", "max_size", "min_seeders", "source")}
+
+def _number(value, cast):
+    """value cast to a number, None when missing or unparsable (0 is kept)"""
+    try:
+        return None if value is None or value == "" else cast(value)
+    except ValueError:
+        return None
+
+def ranked_results(form):
+    return RankedResults(
+        form["query"],
+        _number(form["min_size"], float),
+        _number(form["max_size"], float),
+        _number(form["min_seeders"], int),
+        relevance=form["source"] == "history",
+    )
+
+def fetch_entries(form):
+    """Raw results from Jackett, or from the local history index when asked for"""
+    if form["source"] == "history":
+        return search_history(form["query"])
+    return search(form["query"])
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    results = None
     if request.method == "POST":
-        query = request.form.get("query", "").strip()
+        form = search_form(request.form)
         
         # Validate query
-        if not query:
+        if not form["query"]:
             flash("Please enter a search query", "error")
-            return render_template_string(TEMPLATE, results=results)
+            return render_index(form)
         
-        min_size = request.form.get("min_size", type=float)
-        max_size = request.form.get("max_size", type=float)
-        min_seeders = request.form.get("min_seeders", type=int)
-
         try:
-            clauses = query.lower().split()
-            raw_results = search(query)
-            
-            # First pass: filter and sort without resolving magnets (fast operations)
-            filtered_entries = []
-            for entry in raw_results:
-                size_gb = human_size(entry.get("Size", 0))
-                if min_size and size_gb < min_size: continue
-                if max_size and size_gb > max_size: continue
-                if min_seeders and entry.get("Seeders", 0) < min_seeders: continue
-                title = entry.get("Title", "").lower()
-                if not all(c in title for c in clauses): continue
-                
-                # Store entry data without resolving magnet yet
-                filtered_entries.append({
-                    "entry": entry,
-                    "Title": entry.get("Title", "N/A"),
-                    "SizeGB": size_gb,
-                    "Seeders": entry.get("Seeders", 0),
-                    "Peers": entry.get("Peers", 0)
-                })
-            
-            # Sort by seed count in descending order (highest first)
-            filtered_entries.sort(key=lambda x: x["Seeders"], reverse=True)
-            
-            # Deduplicate entries with same title and peer count
-            seen_entries = set()
-            deduplicated_entries = []
-            for item in filtered_entries:
-                # Create a unique key based on title and peer count
-                unique_key = (item["Title"].lower().strip(), item["Peers"])
-                if unique_key not in seen_entries:
-                    seen_entries.add(unique_key)
-                    deduplicated_entries.append(item)
-            
-            # Limit to top 20 results after deduplication (before resolving magnets)
-            top_entries = deduplicated_entries[:20]
-            
-            # Second pass: resolve magnets only for the top 20 results
-            results = []
-            for item in top_entries:
-                magnet = resolve_magnet(item["entry"])
-                if magnet:  # Only include entries with valid magnets
-                    results.append({
-                        "Title": item["Title"],
-                        "SizeGB": item["SizeGB"],
-                        "Seeders": item["Seeders"],
-                        "Peers": item["Peers"],
-                        "Magnet": magnet
-                    })
-            
+            ranked = ranked_results(form)
+            ranked.add(fetch_entries(form))
         except Exception as e:
             flash(f"Search failed: {str(e)}", "error")
-            return render_template_string(TEMPLATE, results=results)
+            return render_index(form)
+        
+        # Redirect to the stored results so reloads and "back" don't search again
+        sid = new_session(form, ranked, dict(metrics.breakdown()))
+        return redirect(url_for("index", sid=sid, timing=request.args.get("timing")))
+
+    sid = request.args.get("sid")
+    if not sid:
+        return render_index()
+    saved = result_sessions.get(sid)
+    if saved is None:
+        flash("These search results expired, please search again", "info")
+        return render_index()
+    
+    items = saved["items"]
+    pages = max(1, math.ceil(len(items) / PAGE_SIZE))
+    page = min(max(1, request.args.get("page", 1, type=int)), pages)
+    offset = (page - 1) * PAGE_SIZE
+    page_items = items[offset:offset + PAGE_SIZE]
+    
+    # Magnets are resolved on add, the first few are warmed in the background meanwhile
+    prefetch([item["entry"] for item in page_items])
+    timings = metrics.summary(saved["timings"]) if show_timings() else None
+    return render_index(saved["form"], to_results(page_items), sid, page, pages, len(items), timings)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_snapshot(sid, form, ranked, timings=None):
+    """Store the results so far and shape the first page for an SSE event"""
+    save_session(sid, form, ranked, timings)
+    return {
+        "sid": sid,
+        "results": to_results(ranked.top(PAGE_SIZE)),
+        "total": len(ranked.items),
+        "pages": max(1, math.ceil(len(ranked.items) / PAGE_SIZE)),
+    }
 
-    return render_template_string(TEMPLATE, results=results)
+@app.route("/search/stream")
+def search_stream():
+    """Stream ranked results over Server-Sent Events as each indexer answers"""
+    form = search_form(request.args)
+    ranked = ranked_results(form)
+    sid = secrets.token_urlsafe(8)
+    timing = show_timings()
+    g.streaming = True
+
+    def generate():
+        if not form["query"]:
+            yield sse("failed", {"error": "Please enter a search query"})
+            return
+        answered, failed = 0, []
+        started = time.perf_counter()
+        try:
+            for indexer, batch, error in search_streaming(form["query"], form["source"]):
+                answered += 1
+                if error:
+                    failed.append(f"{indexer}: {error}")
+                else:
+                    ranked.add(batch)
+                yield sse("results", stream_snapshot(sid, form, ranked) | {"answered": answered, "failed": failed})
+            prefetch([item["entry"] for item in ranked.top(PAGE_SIZE)])
+            # Indexers are queried on pool threads, their wall time is the whole stream
+            timings = {"search": time.perf_counter() - started} | metrics.breakdown()
+            done = stream_snapshot(sid, form, ranked, timings) | {"failed": failed}
+            yield sse("done", done | ({"timings": metrics.summary(timings)} if timing else {}))
+        except Exception as e:
+            yield sse("failed", {"error": f"Search failed: {str(e)}"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def encode_cursor(sid, sort, descending, offset):
+    raw = json.dumps([sid, sort, descending, offset]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    sid, sort, descending, offset = json.loads(raw)
+    if not isinstance(offset, int):
+        raise ValueError("offset must be an integer")
+    return sid, sort, descending, offset
+
+def api_request(args):
+    """
+    Validate /api/search arguments from any mapping of strings.
+
+    Returns (params, None), where params["sid"] is None when a new search is
+    needed, or (None, (error payload, status)).
+    """
+    limit = _number(args.get("limit"), int) or PAGE_SIZE
+    params = {"limit": min(max(1, limit), API_MAX_LIMIT), "form": None, "sid": None, "offset": 0}
+    cursor = args.get("cursor")
+    
+    if cursor:
+        try:
+            params["sid"], params["sort"], params["descending"], params["offset"] = decode_cursor(cursor)
+        except Exception:
+            return None, ({"error": "Invalid cursor"}, 400)
+        if (params["sort"] not in SORT_KEYS or not isinstance(params["sid"], str) or params["offset"] < 0
+                or params["descending"] not in (None, True, False)):
+            return None, ({"error": "Invalid cursor"}, 400)
+        return params, None
+    
+    params["form"] = search_form(args)
+    if not params["form"]["query"]:
+        return None, ({"error": "Missing query"}, 400)
+    params["sort"] = args.get("sort") or ("relevance" if params["form"]["source"] == "history" else "seeders")
+    if params["sort"] not in SORT_KEYS:
+        return None, ({"error": f"Invalid sort, use one of: {', '.join(SORT_KEYS)}"}, 400)
+    order = args.get("order")
+    params["descending"] = None if order is None else order != "asc"
+    return params, None
+
+def api_page(params):
+    """One page of a stored search as (payload, status)"""
+    sid, sort, descending, offset = params["sid"], params["sort"], params["descending"], params["offset"]
+    saved = result_sessions.get(sid)
+    if saved is None:
+        return {"error": "Search expired, please search again"}, 410
+    
+    # Each sort order is computed once per search and reused for later pages
+    orders = saved.setdefault("sorted", {})
+    items = orders.get((sort, descending))
+    if items is None:
+        items = orders[(sort, descending)] = sort_items(saved["items"], sort, descending)
+    
+    page_items = items[offset:offset + params["limit"]]
+    next_offset = offset + len(page_items)
+    return {
+        "sid": sid,
+        "total": len(items),
+        "results": to_results(page_items),
+        "next_cursor": encode_cursor(sid, sort, descending, next_offset) if next_offset < len(items) else None,
+    }, 200
+
+@app.route("/api/search")
+def api_search():
+    """
+    JSON search with cursor pagination.
+
+    The first request takes query, min_size, max_size, min_seeders, sort
+    (seeders, size, age, score or relevance, the default for history),
+    order (asc or desc), limit and source (history to answer from the local
+    index). Following pages pass only the returned
+    cursor (and optionally limit) and are served from the stored results
+    without searching again.
+    """
+    params, error = api_request(request.args)
+    if error:
+        return jsonify(error[0]), error[1]
+    
+    if params["sid"] is None:
+        try:
+            ranked = ranked_results(params["form"])
+            ranked.add(fetch_entries(params["form"]))
+        except Exception as e:
+            return jsonify({"error": f"Search failed: {str(e)}"}), 502
+        params["sid"] = new_session(params["form"], ranked)
+    
+    payload, status = api_page(params)
+    return jsonify(payload), status
+
+@app.route("/metrics")
+def metrics_page():
+    """Prometheus scrape target"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@metrics.collector
+def cache_metrics():
+    """Hit ratios of the in-memory caches and the on-disk magnet cache"""
+    caches = {
+        "search": (search_cache.cache.hits, search_cache.cache.misses, len(search_cache.cache)),
+        "indexers": (indexers_cache.hits, indexers_cache.misses, len(indexers_cache)),
+        "sessions": (result_sessions.hits, result_sessions.misses, len(result_sessions)),
+    }
+    magnets = magnet_cache.stats()
+    caches["magnets"] = (magnets["hits"], magnets["misses"], magnets["entries"])
+    return [
+        ("jackett_search_cache_hits_total", "counter", "Cache hits",
+         [({"cache": name}, hits) for name, (hits, _, _) in caches.items()]),
+        ("jackett_search_cache_misses_total", "counter", "Cache misses",
+         [({"cache": name}, misses) for name, (_, misses, _) in caches.items()]),
+        ("jackett_search_cache_hit_ratio", "gauge", "Hits over lookups since start (all time for magnets)",
+         [({"cache": name}, hits / (hits + misses) if hits + misses else 0.0)
+          for name, (hits, misses, _) in caches.items()]),
+        ("jackett_search_cache_entries", "gauge", "Entries held",
+         [({"cache": name}, entries) for name, (_, _, entries) in caches.items()]),
+    ]
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    g.route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.timings = metrics.start_breakdown()
+    metrics.HTTP_IN_FLIGHT.inc(route=g.route)
+
+@app.after_request
+def add_server_timing(response):
+    g.status = response.status_code
+    if g.get("timings"):
+        response.headers["Server-Timing"] = metrics.server_timing(g.timings)
+    return response
+
+@app.teardown_request
+def finish_request(_):
+    # A streamed response is torn down once when the view returns and again when the
+    # stream ends, the second one counts so SSE connections stay in flight until closed
+    if g.pop("streaming", False) or "route" not in g:
+        return
+    route = g.pop("route")
+    metrics.HTTP_IN_FLIGHT.dec(route=route)
+    metrics.HTTP_SECONDS.observe(time.perf_counter() - g.started, route=route)
+    metrics.HTTP_REQUESTS.inc(route=route, status=g.get("status", 500))
 
 @app.route("/add_magnet", methods=["POST"])
 def add_magnet():
     magnet_url = request.form.get("magnet", "").strip()
     title = request.form.get("title", "Unknown").strip()
+    sid = request.form.get("sid", "")
+    item_id = request.form.get("id", type=int)
+    
+    # Back to the same page of the same results after adding
+    back = url_for("index", sid=sid, page=request.form.get("page", 1, type=int)) if sid else url_for("index")
+    
+    if not magnet_url and sid:
+        saved = result_sessions.get(sid)
+        if saved is None or item_id not in saved["by_id"]:
+            flash("These search results expired, please search again", "error")
+            return redirect(url_for("index"))
+        item = saved["by_id"][item_id]
+        title = item["Title"]
+        # Resolved only now, usually from the cache warmed at search time
+        magnet_url = resolve_magnet(item["entry"])
+        if not magnet_url:
+            flash(f"Could not resolve a magnet for '{title}', skipped", "info")
+            return redirect(back)
     
     if not magnet_url:
         flash("No magnet URL provided", "error")
-        return redirect(url_for("index"))
+        return redirect(back)
     
     if not magnet_url.startswith("magnet:?"):
         flash("Invalid magnet URL format", "error")
-        return redirect(url_for("index"))
+        return redirect(back)
     
     try:
-        success, message = add_magnet_to_transmission(magnet_url)
+        result = add_magnets_to_transmission([magnet_url])[0]
         
-        if success:
+        if result["status"] == "added":
             flash(f"Successfully added '{title}' to Transmission!", "success")
+        elif result["status"] == "exists":
+            flash(f"'{title}' is already in Transmission", "info")
         else:
-            flash(f"Failed to add '{title}': {message}", "error")
+            flash(f"Failed to add '{title}': {result['message']}", "error")
     except Exception as e:
         flash(f"Error adding torrent: {str(e)}", "error")
     
-    return redirect(url_for("index"))
+    return redirect(back)
+
+def magnets_request(data):
+    """
+    Validate an /add_magnets JSON body, None when the request had none.
+
+    Returns ((magnets, sid, ids), None) or (None, (error payload, status)).
+    """
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return None, ({"error": "Expected a JSON object"}, 400)
+    magnets = data.get("magnets") or []
+    ids = data.get("ids") or []
+    sid = data.get("sid")
+    if not isinstance(magnets, list) or not all(isinstance(magnet, str) for magnet in magnets):
+        return None, ({"error": "magnets must be a list of magnet URIs"}, 400)
+    if not isinstance(ids, list) or not all(isinstance(item_id, int) for item_id in ids):
+        return None, ({"error": "ids must be a list of result ids"}, 400)
+    if sid is not None and not isinstance(sid, str):
+        return None, ({"error": "Invalid sid"}, 400)
+    return (magnets, sid, ids), None
+
+@app.route("/add_magnets", methods=["POST"])
+def add_magnets():
+    """
+    Add many torrents in one request.
+
+    Takes a JSON body with "magnets" (a list of magnet URIs) and/or "sid" with
+    "ids" of stored search results, or repeated "magnet" form fields. Results of
+    a stored search are resolved concurrently. Returns one result per item.
+    """
+    params, error = magnets_request(request.get_json(silent=True))
+    if error:
+        return jsonify(error[0]), error[1]
+    magnets, sid, ids = params
+    magnets = list(magnets or request.form.getlist("magnet"))
+    sources = [{} for _ in magnets]
+    
+    failed = []
+    if ids:
+        found = session_items(sid, ids)
+        if found is None:
+            return jsonify({"error": "Search expired, please search again"}), 410
+        items, failed = found
+        for (item_id, item), magnet in zip(items, resolve_many([item["entry"] for _, item in items])):
+            if magnet and magnet != UNRESOLVED:
+                magnets.append(magnet)
+                sources.append({"id": item_id, "title": item["Title"]})
+            else:
+                failed.append({"id": item_id, "title": item["Title"], "status": "unresolved",
+                               "message": "Could not resolve a magnet"})
+    
+    if not magnets and not failed:
+        return jsonify({"error": "No magnets provided"}), 400
+    
+    results = [
+        source | result
+        for source, result in zip(sources, add_magnets_to_transmission(magnets))
+    ]
+    return jsonify({"results": results + failed})
+
+@app.route("/downloads")
+def downloads_page():
+    return render_template(DOWNLOADS_TEMPLATE)
+
+@app.route("/api/downloads")
+def api_downloads():
+    version, torrents = downloads.snapshot()
+    return jsonify({"version": version, "torrents": torrents, "error": downloads.error})
+
+def downloads_update(version):
+    """
+    Bring an SSE client from version up to date.
+
+    Returns (new version, event) where the event is a "snapshot" for new or
+    lagging clients, a "delta" of changed and removed torrents, or None when
+    nothing changed.
+    """
+    delta = None if version is None else downloads.delta(version)
+    if delta is None:
+        version, torrents = downloads.snapshot()
+        return version, sse("snapshot", {"version": version, "torrents": torrents, "error": downloads.error})
+    downloads.watch()
+    if delta[0] == version:
+        return version, None
+    version, changed, removed = delta
+    return version, sse("delta", {"version": version, "changed": changed, "removed": removed,
+                                  "error": downloads.error})
+
+@app.route("/downloads/stream")
+def downloads_stream():
+    """Stream the torrent table over Server-Sent Events, a snapshot first and then deltas"""
+    g.streaming = True
+
+    def generate():
+        version, event = downloads_update(None)
+        while True:
+            # A comment line keeps proxies from closing an idle stream
+            yield event or ": keepalive\n\n"
+            downloads.wait(version, 15)
+            version, event = downloads_update(version)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/watches", methods=["GET"])
+def list_watches():
+    return jsonify({"watches": watcher.list_watches()})
+
+@app.route("/watches", methods=["POST"])
+def add_watch():
+    """
+    Save a search to poll in the background.
+
+    Takes JSON with "query" and optional "min_size", "max_size", "min_seeders",
+    "interval" (seconds) and "auto_add_seeders", the seeders a new match needs
+    to be added to Transmission automatically.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    query = data.get("query") or ""
+    if not isinstance(query, str):
+        return jsonify({"error": "query must be a string"}), 400
+    query = query.strip()
+    if not query:
+        return jsonify({"error": "Missing query"}), 400
+    try:
+        numbers = (
+            _number(data.get("min_size"), float),
+            _number(data.get("max_size"), float),
+            _number(data.get("min_seeders"), int),
+            _number(data.get("auto_add_seeders"), int),
+            _number(data.get("interval"), float),
+        )
+    except (TypeError, OverflowError):
+        return jsonify({"error": "Invalid watch"}), 400
+    if any(n is not None and not math.isfinite(n) for n in numbers):
+        return jsonify({"error": "Numbers must be finite"}), 400
+    watch = watcher.add_watch(query, *numbers)
+    watches.wake()
+    return jsonify(watch), 201
+
+@app.route("/watches/<int:watch_id>", methods=["DELETE"])
+def delete_watch(watch_id):
+    if not watcher.delete_watch(watch_id):
+        return jsonify({"error": "Unknown watch"}), 404
+    return jsonify({"deleted": watch_id})
+
+@app.route("/watches/<int:watch_id>/run", methods=["POST"])
+def run_watch(watch_id):
+    if watcher.get_watch(watch_id) is None:
+        return jsonify({"error": "Unknown watch"}), 404
+    watches.run_now(watch_id)
+    return jsonify({"queued": watch_id}), 202
 
 if __name__ == "__main__":
     # Check if API key is configured
@@ -564,5 +637,15 @@ if __name__ == "__main__":
     print(f"API Key configured: {'*' * (len(API_KEY) - 4) + API_KEY[-4:] if len(API_KEY) > 4 else '***'}")
     print("Server will be available at: http://0.0.0.0:5000")
     
-    app.run(host="0.0.0.0", port=5000)
+    if os.getenv("SERVER") == "asgi":
+        import sys
+        import uvicorn
+        # asgi.py imports this module as "app", reuse it instead of running it a second time
+        sys.modules["app"] = sys.modules[__name__]
+        uvicorn.run("asgi:app", host="0.0.0.0", port=5000,
+                    limit_concurrency=int(os.getenv("ASGI_CONCURRENCY", 256)))
+    else:
+        if watcher.WATCH_ENABLED:
+            watches.start()
+        app.run(host="0.0.0.0", port=5000)
 
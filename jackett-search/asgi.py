@@ -0,0 +1,398 @@
+"""
+ASGI serving mode, run with SERVER=asgi.
+
+The hot paths (/api/search, /search/stream, /add_magnets) are async handlers
+where the Jackett fetch, magnet resolution and Transmission RPC are awaits over
+one shared httpx connection pool, so a slow indexer doesn't hold a thread, and
+long-lived /downloads/stream connections don't pin threads either. The HTML
+pages are served by the Flask app on a small bounded thread pool. Result
+sessions and caches are shared with the Flask app since both run in one process.
+"""
+import asyncio
+import os
+import secrets
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route, request_response
+
+import app as flask_app
+from downloads import DOWNLOADS_POLL
+import history
+import jackett
+import magnet_cache
+import metrics
+from http_pool import HTTP_POOL_SIZE
+from resolver import PREFETCH_TOP, RESOLVE_DEADLINE, RESOLVE_TIMEOUT, RESOLVE_WORKERS, UNRESOLVED, direct_magnet
+from transmission import AsyncTransmissionClient
+import watcher
+
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", 4))  # threads for the Flask pages
+
+client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=HTTP_POOL_SIZE * 2, max_keepalive_connections=HTTP_POOL_SIZE),
+    timeout=httpx.Timeout(jackett.SEARCH_TIMEOUT, connect=10),
+)
+transmission = AsyncTransmissionClient(flask_app.TRANSMISSION_URL, client)
+_resolve_slots = asyncio.Semaphore(RESOLVE_WORKERS)
+_background = set()  # fire-and-forget tasks, referenced until they finish
+
+
+# --- Jackett ---
+async def _get_json(url, params):
+    try:
+        r = await client.get(url, params={"apikey": jackett.API_KEY, **params})
+        r.raise_for_status()
+        return r.json()
+    except httpx.TimeoutException:
+        raise Exception("Jackett API request timed out")
+    except httpx.ConnectError:
+        raise Exception("Could not connect to Jackett API")
+    except httpx.HTTPStatusError as e:
+        raise Exception(f"Jackett API error: {e}")
+    except Exception as e:
+        raise Exception(f"Search error: {str(e)}")
+
+
+async def fetch_results(query):
+    with metrics.indexer_request("all"):
+        results = (await _get_json(jackett.API_URL, {"Query": query})).get("Results", [])
+    history.record_later(results)
+    return results
+
+
+async def fetch_indexer(indexer_id, query):
+    with metrics.indexer_request(indexer_id):
+        results = (await _get_json(jackett.INDEXER_URL.format(indexer_id), {"Query": query})).get("Results", [])
+    history.record_later(results)
+    return results
+
+
+async def list_indexers():
+    indexers = jackett.indexers_cache.get("all")
+    if indexers is None:
+        r = await client.get(jackett.INDEXERS_URL, params=jackett.INDEXERS_PARAMS, timeout=30)
+        r.raise_for_status()
+        indexers = jackett.parse_indexers(r.content)
+        jackett.indexers_cache.put("all", indexers)
+    return indexers
+
+
+async def search(query):
+    if not jackett.API_KEY:
+        raise ValueError("JACKETT_API_KEY environment variable is not set")
+
+    key = jackett.normalize_query(query)
+    results = jackett.search_cache.get_cached(key)
+    if results is None:
+        results = await fetch_results(key)
+        jackett.search_cache.put(key, results)
+    return results
+
+
+async def fetch_entries(form):
+    if form["source"] == "history":
+        return await asyncio.to_thread(jackett.search_history, form["query"])
+    return await search(form["query"])
+
+
+async def search_streaming(query, source="jackett"):
+    """Async counterpart of jackett.search_streaming()"""
+    if source == "history":
+        yield "history", await asyncio.to_thread(jackett.search_history, query), None
+        return
+
+    if not jackett.API_KEY:
+        raise ValueError("JACKETT_API_KEY environment variable is not set")
+
+    key = jackett.normalize_query(query)
+    cached = jackett.search_cache.get_cached(key)
+    if cached is not None:
+        yield "cache", cached, None
+        return
+
+    try:
+        indexers = await list_indexers()
+    except Exception as e:
+        print(f"Listing indexers failed, using the aggregate search: {e}")
+        yield "all", await search(query), None
+        return
+
+    async def run(indexer_id, title):
+        try:
+            return title, await fetch_indexer(indexer_id, key), None
+        except Exception as e:
+            return title, [], str(e)
+
+    tasks = [asyncio.create_task(run(indexer_id, title)) for indexer_id, title in indexers]
+    combined = []
+    failed = False
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=jackett.SEARCH_TIMEOUT):
+            title, batch, error = await next_done
+            failed = failed or error is not None
+            combined.extend(batch)
+            yield title, batch, error
+    except asyncio.TimeoutError:
+        for (_, title), task in zip(indexers, tasks):
+            if not task.done():
+                yield title, [], "timed out"
+        return
+    finally:
+        for task in tasks:
+            task.cancel()
+    if not failed:
+        jackett.search_cache.put(key, combined)
+
+
+# --- Magnets ---
+async def resolve_magnet(entry, timeout=RESOLVE_TIMEOUT):
+    """Async counterpart of resolver.resolve_magnet(), sharing the on-disk cache"""
+    magnet = direct_magnet(entry)
+    if magnet or not entry.get("Link"):
+        metrics.RESOLVES.inc(result="direct" if magnet else "missing")
+        return magnet
+    with metrics.timed("resolve"):
+        cached = await asyncio.to_thread(magnet_cache.get, entry)
+        if cached:
+            metrics.RESOLVES.inc(result="cached")
+            return cached
+        async with _resolve_slots:
+            try:
+                r = await client.get(entry["Link"], follow_redirects=False, timeout=timeout)
+            except Exception as e:
+                print(f"Error resolving Link for {entry.get('Title')}: {e}")
+                metrics.RESOLVES.inc(result="failed")
+                return None
+        location = r.headers.get("Location", "")
+        if location.startswith("magnet:?"):
+            await asyncio.to_thread(magnet_cache.put, entry, location)
+            metrics.RESOLVES.inc(result="resolved")
+            return location
+    metrics.RESOLVES.inc(result="failed")
+    return None
+
+
+async def resolve_many(entries, deadline=RESOLVE_DEADLINE):
+    """Async counterpart of resolver.resolve_many()"""
+    started = time.monotonic()
+    timeout = min(RESOLVE_TIMEOUT, deadline)
+    tasks = [asyncio.create_task(resolve_magnet(entry, timeout)) for entry in entries]
+    if tasks:
+        await asyncio.wait(tasks, timeout=max(0.0, deadline - (time.monotonic() - started)))
+    magnets = []
+    for task in tasks:
+        if task.done():
+            magnets.append(task.result())
+        else:
+            task.cancel()
+            metrics.RESOLVES.inc(result="deadline")
+            magnets.append(UNRESOLVED)
+    return magnets
+
+
+def _prefetch(entry):
+    """Resolve a magnet in the background, logging instead of losing its error"""
+    task = asyncio.create_task(resolve_magnet(entry))
+    _background.add(task)
+
+    def finished(task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Prefetching a magnet for {entry.get('Title')} failed: {task.exception()}")
+
+    task.add_done_callback(finished)
+
+
+async def add_magnets_to_transmission(magnets):
+    """Async counterpart of app.add_magnets_to_transmission()"""
+    try:
+        existing = await transmission.torrent_hashes()
+    except Exception as e:
+        print(f"Could not list Transmission torrents: {e}")
+        existing = {}
+
+    plan = flask_app.plan_additions(magnets, existing)
+    for item in plan:
+        if item["status"] is None:
+            try:
+                await transmission.add_magnet(item["magnet"])
+                item.update(status="added", message="Torrent added successfully!")
+            except httpx.TimeoutException:
+                item.update(status="failed", message="Timeout while connecting to Transmission")
+            except httpx.ConnectError:
+                item.update(status="failed", message="Could not connect to Transmission daemon")
+            except Exception as e:
+                item.update(status="failed", message=str(e))
+    return plan
+
+
+# --- Routes ---
+async def api_search(request: Request):
+    """Async /api/search, same parameters and responses as the Flask view"""
+    params, error = flask_app.api_request(request.query_params)
+    if error:
+        return JSONResponse(error[0], status_code=error[1])
+
+    if params["sid"] is None:
+        try:
+            ranked = flask_app.ranked_results(params["form"])
+            await asyncio.to_thread(ranked.add, await fetch_entries(params["form"]))
+        except Exception as e:
+            return JSONResponse({"error": f"Search failed: {str(e)}"}, status_code=502)
+        params["sid"] = flask_app.new_session(params["form"], ranked)
+
+    payload, status = flask_app.api_page(params)
+    return JSONResponse(payload, status_code=status)
+
+
+async def search_stream(request: Request):
+    """Async /search/stream, same events as the Flask view"""
+    form = flask_app.search_form(request.query_params)
+    ranked = flask_app.ranked_results(form)
+    sid = secrets.token_urlsafe(8)
+    sse = flask_app.sse
+    timing = flask_app.SHOW_TIMINGS or request.query_params.get("timing") == "1"
+
+    async def generate():
+        if not form["query"]:
+            yield sse("failed", {"error": "Please enter a search query"})
+            return
+        answered, failed = 0, []
+        started = time.perf_counter()
+        try:
+            async for indexer, batch, error in search_streaming(form["query"], form["source"]):
+                answered += 1
+                if error:
+                    failed.append(f"{indexer}: {error}")
+                else:
+                    await asyncio.to_thread(ranked.add, batch)
+                snapshot = flask_app.stream_snapshot(sid, form, ranked)
+                yield sse("results", snapshot | {"answered": answered, "failed": failed})
+            # Warm the magnet cache for the first rows without holding the stream
+            for item in ranked.top(PREFETCH_TOP):
+                _prefetch(item["entry"])
+            timings = {"search": time.perf_counter() - started} | metrics.breakdown()
+            done = flask_app.stream_snapshot(sid, form, ranked, timings) | {"failed": failed}
+            yield sse("done", done | ({"timings": metrics.summary(timings)} if timing else {}))
+        except Exception as e:
+            yield sse("failed", {"error": f"Search failed: {str(e)}"})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def downloads_stream(request: Request):
+    """Async /downloads/stream, checks the shared table each poll instead of holding a thread"""
+    async def generate():
+        version, event = await asyncio.to_thread(flask_app.downloads_update, None)
+        while True:
+            yield event or ": keepalive\n\n"
+            for _ in range(max(1, int(15 / DOWNLOADS_POLL))):
+                await asyncio.sleep(DOWNLOADS_POLL)
+                version, event = await asyncio.to_thread(flask_app.downloads_update, version)
+                if event:
+                    break
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def add_magnets(request: Request):
+    """Async /add_magnets, same body and responses as the Flask view"""
+    try:
+        data = await request.json()
+    except Exception:
+        data = None
+    params, error = flask_app.magnets_request(data)
+    if error:
+        return JSONResponse(error[0], status_code=error[1])
+    magnets, sid, ids = params
+    magnets = list(magnets)
+    if not magnets and "form" in request.headers.get("content-type", ""):
+        magnets = (await request.form()).getlist("magnet")
+    sources = [{} for _ in magnets]
+
+    failed = []
+    if ids:
+        found = flask_app.session_items(sid, ids)
+        if found is None:
+            return JSONResponse({"error": "Search expired, please search again"}, status_code=410)
+        items, failed = found
+        for (item_id, item), magnet in zip(items, await resolve_many([item["entry"] for _, item in items])):
+            if magnet and magnet != UNRESOLVED:
+                magnets.append(magnet)
+                sources.append({"id": item_id, "title": item["Title"]})
+            else:
+                failed.append({"id": item_id, "title": item["Title"], "status": "unresolved",
+                               "message": "Could not resolve a magnet"})
+
+    if not magnets and not failed:
+        return JSONResponse({"error": "No magnets provided"}, status_code=400)
+
+    results = [
+        source | result
+        for source, result in zip(sources, await add_magnets_to_transmission(magnets))
+    ]
+    return JSONResponse({"results": results + failed})
+
+
+class Instrumented:
+    """ASGI wrapper around an async view recording the same request metrics as the Flask hooks"""
+
+    def __init__(self, route, endpoint):
+        self.route = route
+        self.app = request_response(endpoint)
+
+    async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
+        timings = metrics.start_breakdown()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings:
+                    header = (b"server-timing", metrics.server_timing(timings).encode())
+                    message = message | {"headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        metrics.HTTP_IN_FLIGHT.inc(route=self.route)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.HTTP_IN_FLIGHT.dec(route=self.route)
+            metrics.HTTP_SECONDS.observe(time.perf_counter() - started, route=self.route)
+            metrics.HTTP_REQUESTS.inc(route=self.route, status=status)
+
+
+@asynccontextmanager
+async def lifespan(_):
+    if watcher.WATCH_ENABLED:
+        flask_app.watches.start()
+    yield
+    await client.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/search", Instrumented("/api/search", api_search)),
+        Route("/search/stream", Instrumented("/search/stream", search_stream)),
+        Route("/add_magnets", Instrumented("/add_magnets", add_magnets), methods=["POST"]),
+        Route("/downloads/stream", Instrumented("/downloads/stream", downloads_stream)),
+        Mount("/", WSGIMiddleware(flask_app.app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional per-entry TTL"""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def get_with_age(self, key):
+        """Return (value, age in seconds) or (None, None) on a miss"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                age = time.monotonic() - item[1]
+                if self.ttl is None or age < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return item[0], age
+                del self._data[key]
+            self.misses += 1
+            return None, None
+
+    def get(self, key):
+        return self.get_with_age(key)[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class StaleWhileRevalidate:
+    """
+    Cache in front of a slow fetch(key) function.
+
+    Fresh entries are served as is. Stale entries (older than fresh_for but
+    within fresh_for + stale_for) are served immediately while one background
+    refresh replaces them. Anything older is fetched synchronously.
+    """
+
+    def __init__(self, fetch, maxsize, fresh_for, stale_for, workers=2):
+        self.fetch = fetch
+        self.fresh_for = fresh_for
+        self.cache = LRUCache(maxsize, ttl=fresh_for + stale_for)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="revalidate")
+
+    def get(self, key):
+        value = self.get_cached(key)
+        if value is None:
+            value = self.fetch(key)
+            self.cache.put(key, value)
+        return value
+
+    def get_cached(self, key):
+        """Like get() but returns None instead of fetching on a miss"""
+        value, age = self.cache.get_with_age(key)
+        if value is not None and age >= self.fresh_for:
+            self._revalidate(key)
+        return value
+
+    def put(self, key, value):
+        self.cache.put(key, value)
+
+    def refresh(self, key):
+        """Fetch key again in the background, at most once at a time"""
+        self._revalidate(key)
+
+    def _revalidate(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._pool.submit(self._refresh, key)
+
+    def _refresh(self, key):
+        try:
+            self.cache.put(key, self.fetch(key))
+        except Exception as e:
+            print(f"Background refresh failed for {key!r}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
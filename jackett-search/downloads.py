@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from collections import deque
+
+DOWNLOADS_POLL = float(os.getenv("DOWNLOADS_POLL", 2))  # seconds between delta polls
+DOWNLOADS_FULL_EVERY = float(os.getenv("DOWNLOADS_FULL_EVERY", 60))  # seconds between full snapshots
+DOWNLOADS_IDLE = float(os.getenv("DOWNLOADS_IDLE", 30))  # seconds without viewers before polling stops
+
+# Only what the dashboard shows, Transmission serializes every field asked for
+FIELDS = [
+    "id", "hashString", "name", "status", "percentDone", "rateDownload", "rateUpload",
+    "eta", "sizeWhenDone", "uploadRatio", "error", "errorString", "addedDate",
+]
+
+
+class DownloadsTable:
+    """
+    In-memory copy of Transmission's torrent list, kept current by delta polling.
+
+    A full torrent-get snapshot runs every DOWNLOADS_FULL_EVERY seconds; in
+    between only ids "recently-active" are fetched, so each poll costs the
+    same whether ten or a thousand torrents are seeding. Polling only runs
+    while someone looks at the dashboard. Every change bumps the version and
+    is kept in a short log so SSE clients can catch up with deltas.
+    """
+
+    def __init__(self, transmission, changes=256):
+        self.transmission = transmission
+        self.torrents = {}  # id -> torrent
+        self.version = 0
+        self.error = None
+        self._changes = deque(maxlen=changes)  # (version, changed ids, removed ids)
+        self._full_at = None
+        self._watched_at = 0.0
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def snapshot(self):
+        """(version, torrents by name) as of now, starting the poller if it is idle"""
+        self.watch()
+        with self._changed:
+            return self.version, sorted(self.torrents.values(), key=lambda t: (t.get("name") or "").lower())
+
+    def wait(self, version, timeout):
+        """
+        Block until the table moves past version or timeout passes.
+
+        Returns (version, changed torrents, removed ids), or None when version is
+        too old for the change log and the caller needs a new snapshot.
+        """
+        self.watch()
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > version, timeout)
+            return self.delta(version)
+
+    def delta(self, version):
+        with self._changed:
+            if version == self.version:
+                return self.version, [], []
+            if version > self.version or not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed, removed = set(), set()
+            for v, ids, gone in self._changes:
+                if v > version:
+                    changed |= ids
+                    changed -= gone
+                    removed |= gone
+                    removed -= ids
+            return self.version, [self.torrents[i] for i in changed if i in self.torrents], sorted(removed)
+
+    def watch(self):
+        """Note a viewer, polling continues until nobody has looked for DOWNLOADS_IDLE seconds"""
+        with self._changed:
+            self._watched_at = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="downloads", daemon=True)
+                self._thread.start()
+            # The first viewer waits for the first snapshot instead of seeing an empty table
+            self._changed.wait_for(lambda: self._full_at is not None or self.error, 10)
+
+    def _loop(self):
+        while True:
+            with self._changed:
+                if time.monotonic() - self._watched_at >= DOWNLOADS_IDLE:
+                    # Idle, the next viewer starts the poller again from a full snapshot
+                    self._thread = None
+                    self._full_at = None
+                    return
+            try:
+                self.poll()
+                self.error = None
+            except Exception as e:
+                print(f"Transmission poll failed: {e}")
+                with self._changed:
+                    self.error = str(e)
+                    self._changed.notify_all()
+            time.sleep(DOWNLOADS_POLL)
+
+    def poll(self):
+        full = self._full_at is None or time.monotonic() - self._full_at >= DOWNLOADS_FULL_EVERY
+        arguments = {"fields": FIELDS}
+        if not full:
+            arguments["ids"] = "recently-active"
+        result = self.transmission.rpc("torrent-get", arguments)
+        self.apply(result.get("torrents", []), result.get("removed", []), full)
+
+    def apply(self, torrents, removed, full=False):
+        """Merge a torrent-get result, recording only torrents whose fields actually changed"""
+        with self._changed:
+            incoming = {t["id"]: t for t in torrents}
+            gone = set(removed) & self.torrents.keys()
+            if full:
+                gone |= self.torrents.keys() - incoming.keys()
+                self._full_at = time.monotonic()
+            changed = {i for i, t in incoming.items() if self.torrents.get(i) != t}
+            for i in gone:
+                del self.torrents[i]
+            for i in changed:
+                self.torrents[i] = incoming[i]
+            if changed or gone:
+                self.version += 1
+                self._changes.append((self.version, changed, gone))
+            self._changed.notify_all()
@@ -0,0 +1,187 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from magnet_cache import entry_infohash
+
+HISTORY_PATH = os.getenv(
+    "HISTORY_PATH",
+    os.path.expanduser("~/.cache/jackett-search/history.sqlite3"),
+)
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", 1000))  # rows returned per local search
+HISTORY_MAX_AGE = float(os.getenv("HISTORY_MAX_AGE", 180 * 24 * 3600))  # seconds since a torrent was last seen
+HISTORY_MAX_ENTRIES = int(os.getenv("HISTORY_MAX_ENTRIES", 200000))
+HISTORY_QUEUE = int(os.getenv("HISTORY_QUEUE", 64))  # result batches waiting for the writer thread
+
+_local = threading.local()
+_pending = queue.Queue(maxsize=HISTORY_QUEUE)
+_writer = None
+_writer_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS torrents (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    seeders INTEGER NOT NULL,
+    peers INTEGER NOT NULL,
+    infohash TEXT,
+    link TEXT,
+    guid TEXT,
+    magnet_uri TEXT,
+    tracker TEXT,
+    publish_date TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS torrents_last_seen ON torrents (last_seen);
+CREATE VIRTUAL TABLE IF NOT EXISTS torrents_fts USING fts5(
+    title, content='torrents', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS torrents_ai AFTER INSERT ON torrents BEGIN
+    INSERT INTO torrents_fts (rowid, title) VALUES (new.id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS torrents_ad AFTER DELETE ON torrents BEGIN
+    INSERT INTO torrents_fts (torrents_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+DROP TRIGGER IF EXISTS torrents_au;
+-- Re-seen torrents keep their FTS row unless the indexer renamed them
+CREATE TRIGGER IF NOT EXISTS torrents_au_title AFTER UPDATE OF title ON torrents
+WHEN old.title IS NOT new.title BEGIN
+    INSERT INTO torrents_fts (torrents_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO torrents_fts (rowid, title) VALUES (new.id, new.title);
+END;
+"""
+
+
+def _connect():
+    """Per-thread connection; WAL lets the app and query.py share the file"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(HISTORY_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(HISTORY_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _key(entry):
+    infohash = entry_infohash(entry)
+    if infohash:
+        return f"btih:{infohash}"
+    return f"ref:{entry.get('Link') or entry.get('Guid') or entry.get('Title', '')}"
+
+
+def record(entries):
+    """Upsert Jackett results, keeping when each torrent was first and last seen"""
+    if not entries:
+        return
+    now = time.time()
+    # Indexers send null counts now and then, the columns are NOT NULL
+    rows = [(
+        _key(e), e.get("Title") or "N/A", e.get("Size") or 0, e.get("Seeders") or 0, e.get("Peers") or 0,
+        entry_infohash(e), e.get("Link"), e.get("Guid"), e.get("MagnetUri"), e.get("Tracker"),
+        e.get("PublishDate"), now, now,
+    ) for e in entries]
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO torrents (key, title, size, seeders, peers, infohash, link, guid,"
+                " magnet_uri, tracker, publish_date, first_seen, last_seen)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET"
+                " title = excluded.title, size = excluded.size, seeders = excluded.seeders,"
+                " peers = excluded.peers, link = COALESCE(excluded.link, link),"
+                " guid = COALESCE(excluded.guid, guid),"
+                " magnet_uri = COALESCE(excluded.magnet_uri, magnet_uri),"
+                " tracker = excluded.tracker, publish_date = excluded.publish_date,"
+                " last_seen = excluded.last_seen",
+                rows,
+            )
+            _prune(conn, now)
+    except sqlite3.Error as e:
+        print(f"History write failed: {e}")
+
+
+def _prune(conn, now):
+    """Forget torrents not seen for HISTORY_MAX_AGE, then the oldest beyond HISTORY_MAX_ENTRIES"""
+    conn.execute("DELETE FROM torrents WHERE last_seen <= ?", (now - HISTORY_MAX_AGE,))
+    (count,) = conn.execute("SELECT COUNT(*) FROM torrents").fetchone()
+    if count > HISTORY_MAX_ENTRIES:
+        conn.execute(
+            "DELETE FROM torrents WHERE id IN (SELECT id FROM torrents ORDER BY last_seen LIMIT ?)",
+            (count - HISTORY_MAX_ENTRIES,),
+        )
+
+
+def record_later(entries):
+    """
+    Queue results for record() on a writer thread so searches don't wait on the disk.
+
+    Batches queued while a write runs are upserted together in one transaction.
+    When HISTORY_QUEUE batches are already waiting the new one is dropped.
+    """
+    global _writer
+    if not entries:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name="history", daemon=True)
+            _writer.start()
+    try:
+        _pending.put_nowait(entries)
+    except queue.Full:
+        print(f"History writer is behind, {len(entries)} results not recorded")
+
+
+def _write_loop():
+    while True:
+        entries = list(_pending.get())
+        while True:
+            try:
+                entries.extend(_pending.get_nowait())
+            except queue.Empty:
+                break
+        record(entries)
+
+
+def _match_expression(query):
+    """Every word must match a title token, words also match as token prefixes"""
+    words = re.findall(r"\w+", query.lower())
+    return " AND ".join(f'"{w}"*' for w in words)
+
+
+def search(query, limit=HISTORY_LIMIT):
+    """
+    Answer a query from everything Jackett has returned before.
+
+    Returns Jackett-shaped entries, best bm25 matches first, with FirstSeen
+    and LastSeen unix timestamps added.
+    """
+    expression = _match_expression(query)
+    if not expression:
+        return []
+    rows = _connect().execute(
+        "SELECT t.title, t.size, t.seeders, t.peers, t.infohash, t.link, t.guid, t.magnet_uri,"
+        " t.tracker, t.publish_date, t.first_seen, t.last_seen"
+        " FROM torrents_fts JOIN torrents t ON t.id = torrents_fts.rowid"
+        " WHERE torrents_fts MATCH ? ORDER BY bm25(torrents_fts) LIMIT ?",
+        (expression, limit),
+    ).fetchall()
+    entries = []
+    for title, size, seeders, peers, infohash, link, guid, magnet_uri, tracker, published, first, last in rows:
+        entry = {
+            "Title": title, "Size": size, "Seeders": seeders, "Peers": peers,
+            "InfoHash": infohash, "Link": link, "Guid": guid, "MagnetUri": magnet_uri,
+            "Tracker": tracker, "PublishDate": published, "FirstSeen": first, "LastSeen": last,
+        }
+        entries.append({k: v for k, v in entry.items() if v is not None})
+    return entries
@@ -0,0 +1,13 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))  # keep-alive connections per host
+
+# One long-lived session for Jackett, Transmission and tracker lookups;
+# urllib3 keeps a separate keep-alive pool for every host it talks to
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=HTTP_POOL_SIZE)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
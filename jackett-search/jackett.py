@@ -0,0 +1,160 @@
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+
+import requests
+
+import history
+import metrics
+from caching import LRUCache, StaleWhileRevalidate
+from http_pool import session
+
+JACKETT_URL = os.getenv("JACKETT_URL", "http://127.0.0.1:9117")
+API_URL = f"{JACKETT_URL}/api/v2.0/indexers/all/results"
+INDEXERS_URL = f"{JACKETT_URL}/api/v2.0/indexers/all/results/torznab/api"
+INDEXER_URL = JACKETT_URL + "/api/v2.0/indexers/{}/results"
+API_KEY = os.getenv("JACKETT_API_KEY")
+INDEXERS_PARAMS = {"apikey": API_KEY, "t": "indexers", "configured": "true"}
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", 64))  # queries kept in memory
+SEARCH_FRESH_FOR = float(os.getenv("SEARCH_FRESH_FOR", 300))  # seconds served as is
+SEARCH_STALE_FOR = float(os.getenv("SEARCH_STALE_FOR", 1800))  # seconds served while refreshing
+
+INDEXER_WORKERS = int(os.getenv("INDEXER_WORKERS", 8))  # indexers queried at once
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", 120))  # seconds
+HISTORY_REFRESH = os.getenv("HISTORY_REFRESH", "1") == "1"  # refresh from Jackett after history searches
+
+_indexer_pool = ThreadPoolExecutor(max_workers=INDEXER_WORKERS, thread_name_prefix="indexer")
+indexers_cache = LRUCache(1, ttl=600)
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def _get_json(url, params):
+    try:
+        r = session.get(url, params={"apikey": API_KEY, **params}, timeout=SEARCH_TIMEOUT)
+        r.raise_for_status()
+        return r.json()
+    except requests.exceptions.Timeout:
+        raise Exception("Jackett API request timed out")
+    except requests.exceptions.ConnectionError:
+        raise Exception("Could not connect to Jackett API")
+    except requests.exceptions.HTTPError as e:
+        raise Exception(f"Jackett API error: {e}")
+    except Exception as e:
+        raise Exception(f"Search error: {str(e)}")
+
+
+def fetch_results(query):
+    with metrics.indexer_request("all"):
+        results = _get_json(API_URL, {"Query": query}).get("Results", [])
+    history.record_later(results)
+    return results
+
+
+def fetch_indexer(indexer_id, query):
+    with metrics.indexer_request(indexer_id):
+        results = _get_json(INDEXER_URL.format(indexer_id), {"Query": query}).get("Results", [])
+    history.record_later(results)
+    return results
+
+
+def list_indexers():
+    """Configured indexers as (id, title) pairs, cached for a few minutes"""
+    indexers = indexers_cache.get("all")
+    if indexers is None:
+        r = session.get(INDEXERS_URL, params=INDEXERS_PARAMS, timeout=30)
+        r.raise_for_status()
+        indexers = parse_indexers(r.content)
+        indexers_cache.put("all", indexers)
+    return indexers
+
+
+def parse_indexers(content):
+    return [
+        (node.get("id"), node.findtext("title") or node.get("id"))
+        for node in ET.fromstring(content).iter("indexer")
+    ]
+
+
+# Raw Jackett results keyed by normalized query; size/seeder filters run after this
+search_cache = StaleWhileRevalidate(
+    fetch_results, SEARCH_CACHE_SIZE, SEARCH_FRESH_FOR, SEARCH_STALE_FOR
+)
+
+
+def search(query):
+    if not API_KEY:
+        raise ValueError("JACKETT_API_KEY environment variable is not set")
+
+    return search_cache.get(normalize_query(query))
+
+
+def search_history(query):
+    """
+    Answer from the local index of past results in milliseconds, works offline.
+
+    Unless the query is already cached, Jackett is queried in the background
+    so the next history search includes anything new.
+    """
+    key = normalize_query(query)
+    if HISTORY_REFRESH and API_KEY and search_cache.get_cached(key) is None:
+        search_cache.refresh(key)
+    return history.search(query)
+
+
+def search_streaming(query, source="jackett"):
+    """
+    Query every configured indexer concurrently.
+
+    Yields (indexer title, results, error) as each indexer answers, fastest
+    first. A cached query is yielded at once as a single batch. The combined
+    results are stored in the search cache only when every indexer answered,
+    so a failed search is retried instead of served as an empty one.
+    """
+    if source == "history":
+        yield "history", search_history(query), None
+        return
+
+    if not API_KEY:
+        raise ValueError("JACKETT_API_KEY environment variable is not set")
+
+    key = normalize_query(query)
+    cached = search_cache.get_cached(key)
+    if cached is not None:
+        yield "cache", cached, None
+        return
+
+    try:
+        indexers = list_indexers()
+    except Exception as e:
+        print(f"Listing indexers failed, using the aggregate search: {e}")
+        yield "all", search(query), None
+        return
+
+    futures = {
+        _indexer_pool.submit(fetch_indexer, indexer_id, key): title
+        for indexer_id, title in indexers
+    }
+    combined = []
+    failed = False
+    try:
+        for future in as_completed(futures, timeout=SEARCH_TIMEOUT):
+            try:
+                batch = future.result()
+            except Exception as e:
+                failed = True
+                yield futures[future], [], str(e)
+                continue
+            combined.extend(batch)
+            yield futures[future], batch, None
+    except TimeoutError:
+        for future, title in futures.items():
+            if not future.done():
+                future.cancel()
+                yield title, [], "timed out"
+        return
+    if not failed:
+        search_cache.put(key, combined)
@@ -0,0 +1,154 @@
+import base64
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+CACHE_PATH = os.getenv(
+    "MAGNET_CACHE_PATH",
+    os.path.expanduser("~/.cache/jackett-search/magnets.sqlite3"),
+)
+CACHE_TTL = float(os.getenv("MAGNET_CACHE_TTL", 30 * 24 * 3600))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("MAGNET_CACHE_MAX_ENTRIES", 20000))
+
+_BTIH = re.compile(r"^urn:btih:([0-9a-fA-F]{40}|[A-Za-z2-7]{32})$")
+
+_local = threading.local()
+
+
+def _hex_infohash(infohash):
+    """40-character lowercase hex as Transmission reports it, 32-character base32 hashes are decoded"""
+    if len(infohash) == 32:
+        try:
+            return base64.b32decode(infohash.upper()).hex()
+        except ValueError:
+            pass
+    return infohash.lower()
+
+
+def infohash_from_magnet(magnet):
+    """Return the lowercase hex btih infohash of a magnet URI, or None"""
+    if not magnet or not magnet.startswith("magnet:?"):
+        return None
+    for xt in parse_qs(urlparse(magnet).query).get("xt", []):
+        match = _BTIH.match(xt)
+        if match:
+            return _hex_infohash(match.group(1))
+    return None
+
+
+def entry_infohash(entry):
+    """Infohash of a Jackett entry from InfoHash, MagnetUri or a magnet Guid"""
+    if entry.get("InfoHash"):
+        return _hex_infohash(entry["InfoHash"])
+    return infohash_from_magnet(entry.get("MagnetUri")) or infohash_from_magnet(entry.get("Guid"))
+
+
+def _keys(entry):
+    """Cache keys for an entry, most specific first"""
+    keys = []
+    infohash = entry_infohash(entry)
+    if infohash:
+        keys.append(f"btih:{infohash}")
+    if entry.get("Link"):
+        keys.append(f"link:{entry['Link']}")
+    if entry.get("Guid"):
+        keys.append(f"guid:{entry['Guid']}")
+    return keys
+
+
+def _connect():
+    """Per-thread connection; WAL lets the app and query.py share the file"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS magnets ("
+            " key TEXT PRIMARY KEY,"
+            " magnet TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS magnets_accessed ON magnets (accessed_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+        _local.conn = conn
+    return conn
+
+
+def get(entry):
+    """Return the cached magnet for an entry, or None on a miss"""
+    keys = _keys(entry)
+    if not keys:
+        return None
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            placeholders = ",".join("?" * len(keys))
+            row = conn.execute(
+                f"SELECT key, magnet FROM magnets WHERE key IN ({placeholders}) AND stored_at > ? LIMIT 1",
+                (*keys, now - CACHE_TTL),
+            ).fetchone()
+            if row:
+                conn.execute("UPDATE magnets SET accessed_at = ? WHERE key = ?", (now, row[0]))
+            conn.execute(
+                "UPDATE counters SET value = value + 1 WHERE name = ?",
+                ("hits" if row else "misses",),
+            )
+        return row[1] if row else None
+    except sqlite3.Error as e:
+        print(f"Magnet cache read failed: {e}")
+        return None
+
+
+def put(entry, magnet):
+    """Store a resolved magnet under every key of the entry and its infohash"""
+    keys = _keys(entry)
+    infohash = infohash_from_magnet(magnet)
+    if infohash and f"btih:{infohash}" not in keys:
+        keys.append(f"btih:{infohash}")
+    if not magnet or not keys:
+        return
+    now = time.time()
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR REPLACE INTO magnets (key, magnet, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                [(key, magnet, now, now) for key in keys],
+            )
+            _evict(conn, now)
+    except sqlite3.Error as e:
+        print(f"Magnet cache write failed: {e}")
+
+
+def _evict(conn, now):
+    conn.execute("DELETE FROM magnets WHERE stored_at <= ?", (now - CACHE_TTL,))
+    (count,) = conn.execute("SELECT COUNT(*) FROM magnets").fetchone()
+    if count > CACHE_MAX_ENTRIES:
+        conn.execute(
+            "DELETE FROM magnets WHERE key IN (SELECT key FROM magnets ORDER BY accessed_at LIMIT ?)",
+            (count - CACHE_MAX_ENTRIES,),
+        )
+
+
+def stats():
+    """Hit/miss counters shared by every process using the cache"""
+    conn = _connect()
+    counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+    (entries,) = conn.execute("SELECT COUNT(*) FROM magnets").fetchone()
+    lookups = counters["hits"] + counters["misses"]
+    return {
+        "hits": counters["hits"],
+        "misses": counters["misses"],
+        "hit_ratio": counters["hits"] / lookups if lookups else 0.0,
+        "entries": entries,
+    }
@@ -0,0 +1,195 @@
+"""
+In-process counters, gauges and histograms rendered in the Prometheus text format.
+
+timed() records a pipeline stage in STAGE_SECONDS and, when the current request
+collects a breakdown (start_breakdown), adds it there too.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds, from a cached lookup up to a slow indexer hitting SEARCH_TIMEOUT
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_metrics = []
+_collectors = []
+_breakdown = contextvars.ContextVar("breakdown", default=None)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labels, key)), value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [0] * (len(BUCKETS) + 2))  # buckets, count, sum
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        samples = []
+        for _, labels, counts in super().samples():
+            for bound, count in zip(BUCKETS, counts):
+                samples.append((f"{self.name}_bucket", labels | {"le": str(bound)}, count))
+            samples.append((f"{self.name}_bucket", labels | {"le": "+Inf"}, counts[-2]))
+            samples.append((f"{self.name}_count", labels, counts[-2]))
+            samples.append((f"{self.name}_sum", labels, counts[-1]))
+        return samples
+
+
+STAGE_SECONDS = Histogram(
+    "jackett_search_stage_seconds", "Time per pipeline stage (jackett, filter, resolve, render, transmission)", ["stage"]
+)
+INDEXER_SECONDS = Histogram("jackett_search_indexer_seconds", "Jackett request latency per indexer", ["indexer"])
+INDEXER_ERRORS = Counter("jackett_search_indexer_errors_total", "Failed Jackett requests per indexer", ["indexer"])
+RESOLVES = Counter(
+    "jackett_search_resolves_total", "Magnet lookups by outcome (direct, cached, resolved, failed, deadline)", ["result"]
+)
+TRANSMISSION_SECONDS = Histogram("jackett_search_transmission_seconds", "Transmission RPC latency", ["method"])
+TRANSMISSION_ERRORS = Counter("jackett_search_transmission_errors_total", "Failed Transmission RPC calls", ["method"])
+HTTP_SECONDS = Histogram("jackett_search_http_seconds", "Request handling time per route", ["route"])
+HTTP_REQUESTS = Counter("jackett_search_http_requests_total", "Requests per route and status", ["route", "status"])
+HTTP_IN_FLIGHT = Gauge("jackett_search_http_in_flight", "Requests being handled per route", ["route"])
+
+
+def collector(fn):
+    """Register fn() -> [(name, kind, help, [(labels, value)])] evaluated on every scrape"""
+    _collectors.append(fn)
+    return fn
+
+
+@collector
+def resolve_success():
+    """Share of Link lookups that produced a magnet, from the cache or the tracker"""
+    results = {labels["result"]: value for _, labels, value in RESOLVES.samples()}
+    found = results.get("cached", 0) + results.get("resolved", 0)
+    lookups = found + results.get("failed", 0) + results.get("deadline", 0)
+    return [("jackett_search_resolve_success_ratio", "gauge", resolve_success.__doc__,
+             [({}, found / lookups if lookups else 0.0)])]
+
+
+def start_breakdown():
+    """Collect the stages timed from here on in this context, returns the (live) breakdown"""
+    breakdown = {}
+    _breakdown.set(breakdown)
+    return breakdown
+
+
+def breakdown():
+    return _breakdown.get() or {}
+
+
+@contextmanager
+def timed(stage, histogram=None, **labels):
+    """Time a stage, optionally also into a labelled histogram"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        current = _breakdown.get()
+        if current is not None:
+            current[stage] = current.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def indexer_request(indexer):
+    """A Jackett request, timed per indexer and counted as an error if it raises"""
+    try:
+        with timed("jackett", INDEXER_SECONDS, indexer=indexer):
+            yield
+    except Exception:
+        INDEXER_ERRORS.inc(indexer=indexer)
+        raise
+
+
+@contextmanager
+def transmission_call(method):
+    try:
+        with timed("transmission", TRANSMISSION_SECONDS, method=method):
+            yield
+    except Exception:
+        TRANSMISSION_ERRORS.inc(method=method)
+        raise
+
+
+def _format(name, labels, value):
+    if labels:
+        pairs = ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in labels.items()
+        )
+        return f"{name}{{{pairs}}} {value}"
+    return f"{name} {value}"
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(_format(*sample) for sample in metric.samples())
+    for fn in _collectors:
+        try:
+            families = fn()
+        except Exception as e:
+            print(f"Metrics collector {fn.__name__} failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(_format(name, labels, value) for labels, value in samples)
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings):
+    """Breakdown as a Server-Timing header value, shown by browser dev tools"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def summary(timings):
+    """Breakdown as a short line for the results page"""
+    return " · ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings.items())
@@ -0,0 +1,205 @@
+import math
+import os
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+from magnet_cache import entry_infohash
+from resolver import direct_magnet
+
+
+def _rank_weights(spec):
+    """Defaults overridden by "name=weight,..." pairs, malformed pairs are logged and skipped"""
+    weights = {"seeders": 1.0, "peers": 0.25, "age": 0.5}
+    for pair in filter(None, (pair.strip() for pair in spec.split(","))):
+        name, _, weight = pair.partition("=")
+        try:
+            value = float(weight)
+        except ValueError:
+            value = math.nan
+        if name.strip() not in weights or not math.isfinite(value):
+            print(f"Ignoring RANK_WEIGHTS entry {pair!r}, expected {'|'.join(weights)}=<number>")
+            continue
+        weights[name.strip()] = value
+    return weights
+
+
+# Weights of the "score" sort: log seeders and log peers up, log age in days down
+RANK_WEIGHTS = _rank_weights(os.getenv("RANK_WEIGHTS", ""))
+
+
+def human_size(b): return round(b / (1024 ** 3), 2)
+
+
+def dedup_key(entry):
+    """
+    Same infohash means same torrent, whatever the indexer calls it. Entries
+    without a known hash are only merged when they share a Link or Guid.
+    """
+    infohash = entry_infohash(entry)
+    if infohash:
+        return "btih", infohash
+    return "ref", entry.get("Link") or entry.get("Guid") or entry.get("Title", "").lower().strip()
+
+
+def published_at(entry):
+    """PublishDate as a unix timestamp, 0 when missing or unparsable"""
+    try:
+        return datetime.fromisoformat(entry["PublishDate"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def rank_score(seeders, peers, published, now=None):
+    """Ranking score, works on scalars and on whole columns alike"""
+    now = time.time() if now is None else now
+    # Unknown dates count as a year old rather than as 1970
+    age_days = np.where(published > 0, np.maximum(now - published, 0) / 86400, 365)
+    return (
+        RANK_WEIGHTS["seeders"] * np.log1p(seeders)
+        + RANK_WEIGHTS["peers"] * np.log1p(peers)
+        - RANK_WEIGHTS["age"] * np.log1p(age_days)
+    )
+
+
+class Columns:
+    """A batch of Jackett entries as parallel arrays, one per field filtered or ranked on"""
+
+    def __init__(self, entries):
+        n = len(entries)
+        self.entries = entries
+        self.size = np.fromiter((e.get("Size") or 0 for e in entries), np.float64, n)
+        self.seeders = np.fromiter((e.get("Seeders") or 0 for e in entries), np.int64, n)
+        self.peers = np.fromiter((e.get("Peers") or 0 for e in entries), np.int64, n)
+        self.published = np.fromiter((published_at(e) for e in entries), np.float64, n)
+        self.titles = np.array([e.get("Title", "").lower() for e in entries], dtype=str)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def mask(self, clauses=(), min_size=None, max_size=None, min_seeders=None):
+        """Rows passing the size (GB), seeder and title clause filters"""
+        size_gb = np.round(self.size / (1024 ** 3), 2)
+        keep = np.ones(len(self), dtype=bool)
+        if min_size: keep &= size_gb >= min_size
+        if max_size: keep &= size_gb <= max_size
+        if min_seeders: keep &= self.seeders >= min_seeders
+        # Substring tests only run on the rows the numeric filters kept
+        rows = np.flatnonzero(keep)
+        for clause in clauses:
+            if not len(rows):
+                break
+            rows = rows[np.char.find(self.titles[rows], clause) >= 0]
+        keep = np.zeros(len(self), dtype=bool)
+        keep[rows] = True
+        return keep
+
+    def scores(self, now=None):
+        return rank_score(self.seeders, self.peers, self.published, now)
+
+
+# Sort keys with their natural direction (True for descending)
+SORT_KEYS = {
+    "seeders": (lambda item: item["Seeders"], True),
+    "size": (lambda item: item["entry"].get("Size") or 0, True),
+    "age": (lambda item: published_at(item["entry"]), True),  # newest first
+    "score": (lambda item: item["Score"], True),  # RANK_WEIGHTS
+    "relevance": (lambda item: item["Id"], False),  # bm25 order of history searches, arrival order otherwise
+}
+
+
+def sort_items(items, sort="seeders", descending=None):
+    key, natural = SORT_KEYS[sort]
+    return sorted(items, key=key, reverse=natural if descending is None else descending)
+
+
+class RankedResults:
+    """
+    Filtered, deduplicated results ordered by seeders, built up batch by batch.
+
+    Each batch is filtered as columns (see Columns) in one pass. Entries with
+    the same infohash are merged into one item that keeps the highest seeder
+    and peer counts reported by any source, so the order batches arrive in
+    doesn't change the outcome.
+
+    With relevance, entries are history full-text matches arriving best first:
+    the title clauses are skipped, FTS already matched them by token, and that
+    order is kept instead of sorting by seeders.
+    """
+
+    def __init__(self, query, min_size=None, max_size=None, min_seeders=None, relevance=False):
+        self.clauses = [] if relevance else query.lower().split()
+        self.min_size = min_size
+        self.max_size = max_size
+        self.min_seeders = min_seeders
+        self._rank = _arrival if relevance else _by_seeders
+        self.items = []  # sorted by self._rank
+        self.by_id = {}  # every item by its stable Id
+        self._by_key = {}
+        self._listed = 0  # items with a lower Id are already in self.items
+
+    def add(self, entries):
+        """Merge a batch of raw Jackett entries, return how many new torrents were kept"""
+        with metrics.timed("filter"):
+            columns = Columns(entries)
+            rows = np.flatnonzero(columns.mask(self.clauses, self.min_size, self.max_size, self.min_seeders))
+            scores = rank_score(columns.seeders[rows], columns.peers[rows], columns.published[rows])
+            new = []
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                entry = entries[row]
+                key = dedup_key(entry)
+                existing = self._by_key.get(key)
+                if existing is not None:
+                    self._merge(existing, entry, listed=existing["Id"] < self._listed)
+                    continue
+                item = {
+                    "Id": len(self.by_id),
+                    "entry": entry,
+                    "Title": entry.get("Title", "N/A"),
+                    "SizeGB": human_size(entry.get("Size") or 0),
+                    "Seeders": entry.get("Seeders") or 0,
+                    "Peers": entry.get("Peers") or 0,
+                    "Sources": 1,
+                    "Score": score
+                }
+                self._by_key[key] = item
+                self.by_id[item["Id"]] = item
+                new.append(item)
+            # One stable sort per batch, new items land after equally ranked older ones
+            self.items.extend(new)
+            self.items.sort(key=self._rank)
+            self._listed = len(self.by_id)
+            return len(new)
+
+    def _merge(self, item, entry, listed=True):
+        if listed:
+            self._remove(item)
+        item["Seeders"] = max(item["Seeders"], entry.get("Seeders") or 0)
+        item["Peers"] = max(item["Peers"], entry.get("Peers") or 0)
+        item["Sources"] += 1
+        # Prefer a source that carries its magnet so adding needs no lookup
+        if not direct_magnet(item["entry"]) and direct_magnet(entry):
+            item["entry"] = entry
+        item["Score"] = float(rank_score(item["Seeders"], item["Peers"], published_at(item["entry"])))
+        if listed:
+            insort(self.items, item, key=self._rank)
+
+    def _remove(self, item):
+        i = bisect_left(self.items, self._rank(item), key=self._rank)
+        while self.items[i] is not item:
+            i += 1
+        del self.items[i]
+
+    def top(self, n=20):
+        return self.items[:n]
+
+
+def _by_seeders(item):
+    return -item["Seeders"]
+
+
+def _arrival(item):
+    return item["Id"]
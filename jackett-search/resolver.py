@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import magnet_cache
+import metrics
+from http_pool import session
+
+RESOLVE_WORKERS = int(os.getenv("RESOLVE_WORKERS", 8))
+RESOLVE_DEADLINE = float(os.getenv("RESOLVE_DEADLINE", 12))  # seconds per search
+RESOLVE_TIMEOUT = float(os.getenv("RESOLVE_TIMEOUT", 10))  # seconds per lookup
+PREFETCH_TOP = int(os.getenv("PREFETCH_TOP", 3))  # rows resolved ahead of an add, 0 disables
+
+# Marker for entries whose lookup did not finish before the deadline
+UNRESOLVED = "unresolved"
+
+# Bounded pool shared by every search so concurrent searches can't spawn unbounded threads
+_pool = ThreadPoolExecutor(max_workers=RESOLVE_WORKERS, thread_name_prefix="resolve")
+
+
+def direct_magnet(entry):
+    """Magnet carried by the entry itself, no lookup needed"""
+    if entry.get("MagnetUri"):
+        return entry["MagnetUri"]
+    if entry.get("Guid", "").startswith("magnet:?"):
+        return entry["Guid"]
+    return None
+
+
+def resolve_magnet(entry, timeout=RESOLVE_TIMEOUT):
+    """
+    Extract magnet link from an entry:
+    1. MagnetUri field
+    2. Guid if it's a magnet
+    3. Link -> on-disk cache or request -> Location header
+    """
+    magnet = direct_magnet(entry)
+    if magnet:
+        metrics.RESOLVES.inc(result="direct")
+        return magnet
+    if not entry.get("Link"):
+        metrics.RESOLVES.inc(result="missing")
+        return None
+    with metrics.timed("resolve"):
+        cached = magnet_cache.get(entry)
+        if cached:
+            metrics.RESOLVES.inc(result="cached")
+            return cached
+        try:
+            r = session.get(entry["Link"], allow_redirects=False, timeout=timeout)
+            if r.headers.get("Location", "").startswith("magnet:?"):
+                magnet_cache.put(entry, r.headers["Location"])
+                metrics.RESOLVES.inc(result="resolved")
+                return r.headers["Location"]
+        except Exception as e:
+            sys.stderr.write(f"Error resolving Link for {entry.get('Title')}: {e}\n")
+    metrics.RESOLVES.inc(result="failed")
+    return None
+
+
+def resolve_many(entries, deadline=RESOLVE_DEADLINE):
+    """
+    Resolve magnets for all entries concurrently within one overall deadline.
+
+    Returns a list aligned with entries: the magnet, None if the entry has no
+    magnet, or UNRESOLVED if the lookup missed the deadline.
+    """
+    started = time.monotonic()
+    timeout = min(RESOLVE_TIMEOUT, deadline)
+    futures = [_pool.submit(resolve_magnet, entry, timeout) for entry in entries]
+
+    wait(futures, timeout=max(0.0, deadline - (time.monotonic() - started)))
+
+    magnets = []
+    for future in futures:
+        if future.done():
+            magnets.append(future.result())
+        else:
+            # Still queued lookups are dropped, running ones finish in the background
+            future.cancel()
+            metrics.RESOLVES.inc(result="deadline")
+            magnets.append(UNRESOLVED)
+    return magnets
+
+
+def prefetch(entries, top=PREFETCH_TOP):
+    """Warm the magnet cache for the first few entries without waiting for it"""
+    for entry in entries[:top]:
+        if not direct_magnet(entry) and entry.get("Link"):
+            _pool.submit(resolve_magnet, entry)
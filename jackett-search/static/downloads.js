@@ -0,0 +1,107 @@
+// Torrents by id, filled by a snapshot and kept current with deltas
+var torrents = new Map();
+
+var STATUS = ['Stopped', 'Queued to verify', 'Verifying', 'Queued', 'Downloading', 'Queued to seed', 'Seeding'];
+
+function humanBytes(b) {
+    var units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    var i = 0;
+    while (b >= 1024 && i < units.length - 1) { b /= 1024; i++; }
+    return b.toFixed(i ? 1 : 0) + ' ' + units[i];
+}
+
+function humanEta(s) {
+    if (s < 0) return '';
+    if (s < 3600) return Math.ceil(s / 60) + ' min';
+    if (s < 86400) return (s / 3600).toFixed(1) + ' h';
+    return (s / 86400).toFixed(1) + ' d';
+}
+
+function downloadItem(t) {
+    var item = document.createElement('div');
+    item.className = 'torrent-item';
+    var title = document.createElement('div');
+    title.className = 'torrent-title';
+    title.textContent = t.name || '';
+    var bar = document.createElement('div');
+    bar.className = 'progress-bar';
+    var fill = document.createElement('div');
+    fill.className = 'progress-fill' + (t.status === 6 ? ' seeding' : '');
+    fill.style.width = (t.percentDone * 100).toFixed(1) + '%';
+    bar.appendChild(fill);
+    var meta = document.createElement('div');
+    meta.className = 'torrent-meta';
+    var metas = [
+        ['📊', '', (t.percentDone * 100).toFixed(1) + '%', ' ' + (STATUS[t.status] || '')],
+        ['📦', 'size', humanBytes(t.sizeWhenDone), ''],
+        ['⬇️', 'peers', humanBytes(t.rateDownload) + '/s', ''],
+        ['⬆️', 'seeders', humanBytes(t.rateUpload) + '/s', ''],
+        ['🔁', '', t.uploadRatio >= 0 ? t.uploadRatio.toFixed(2) : '-', ' ratio']
+    ];
+    if (t.status === 4 && t.eta >= 0) metas.push(['⏱️', '', humanEta(t.eta), ' left']);
+    if (t.error) metas.push(['⚠️', '', t.errorString, '']);
+    metas.forEach(function(m) {
+        var metaItem = document.createElement('div');
+        metaItem.className = 'meta-item';
+        var icon = document.createElement('span');
+        icon.textContent = m[0];
+        var value = document.createElement('span');
+        value.className = m[1];
+        var strong = document.createElement('strong');
+        strong.textContent = m[2];
+        value.appendChild(strong);
+        value.appendChild(document.createTextNode(m[3]));
+        metaItem.appendChild(icon);
+        metaItem.appendChild(value);
+        meta.appendChild(metaItem);
+    });
+    item.appendChild(title);
+    item.appendChild(meta);
+    item.appendChild(bar);
+    return item;
+}
+
+function render(error) {
+    var sorted = Array.from(torrents.values()).sort(function(a, b) {
+        return (a.name || '').toLowerCase().localeCompare((b.name || '').toLowerCase());
+    });
+    var list = document.getElementById('downloadsList');
+    list.replaceChildren.apply(list, sorted.map(downloadItem));
+    var down = 0, up = 0, active = 0;
+    sorted.forEach(function(t) {
+        down += t.rateDownload;
+        up += t.rateUpload;
+        if (t.status === 4) active++;
+    });
+    document.getElementById('downloadsCount').textContent =
+        sorted.length + ' torrent' + (sorted.length !== 1 ? 's' : '') + ', ' + active + ' downloading';
+    document.getElementById('downloadsRates').textContent =
+        '⬇️ ' + humanBytes(down) + '/s  ⬆️ ' + humanBytes(up) + '/s';
+    var alert = document.getElementById('downloadsError');
+    alert.hidden = !error;
+    alert.textContent = error ? 'Transmission: ' + error : '';
+}
+
+function applySnapshot(data) {
+    torrents = new Map(data.torrents.map(function(t) { return [t.id, t]; }));
+    render(data.error);
+}
+
+if (window.EventSource) {
+    var source = new EventSource('/downloads/stream');
+    source.addEventListener('snapshot', function(msg) {
+        applySnapshot(JSON.parse(msg.data));
+    });
+    source.addEventListener('delta', function(msg) {
+        var data = JSON.parse(msg.data);
+        data.changed.forEach(function(t) { torrents.set(t.id, t); });
+        data.removed.forEach(function(id) { torrents.delete(id); });
+        render(data.error);
+    });
+} else {
+    // No SSE, fall back to plain polling
+    (function poll() {
+        fetch('/api/downloads').then(function(r) { return r.json(); }).then(applySnapshot);
+        setTimeout(poll, 5000);
+    })();
+}
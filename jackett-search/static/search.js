@@ -0,0 +1,116 @@
+// Add keyboard shortcut (Ctrl+Enter to search)
+document.addEventListener('keydown', function(e) {
+    if ((e.ctrlKey || e.metaKey) && e.key === 'Enter') {
+        document.getElementById('searchForm').requestSubmit();
+    }
+});
+
+// Auto-focus search input
+document.getElementById('query').focus();
+
+// Stream results as each indexer answers, the plain form POST stays as a fallback
+var source = null;
+
+function torrentItem(e, sid) {
+    var item = document.createElement('div');
+    item.className = 'torrent-item';
+    var title = document.createElement('div');
+    title.className = 'torrent-title';
+    title.textContent = e.Title;
+    var meta = document.createElement('div');
+    meta.className = 'torrent-meta';
+    var metas = [['📦', 'size', e.SizeGB + ' GB', ''], ['⬆️', 'seeders', e.Seeders, ' seeders'], ['👥', 'peers', e.Peers, ' peers']];
+    if (e.Sources > 1) metas.push(['🔗', '', e.Sources, ' sources']);
+    metas.forEach(function(m) {
+        var metaItem = document.createElement('div');
+        metaItem.className = 'meta-item';
+        var icon = document.createElement('span');
+        icon.textContent = m[0];
+        var value = document.createElement('span');
+        value.className = m[1];
+        var strong = document.createElement('strong');
+        strong.textContent = m[2];
+        value.appendChild(strong);
+        value.appendChild(document.createTextNode(m[3]));
+        metaItem.appendChild(icon);
+        metaItem.appendChild(value);
+        meta.appendChild(metaItem);
+    });
+    var form = document.createElement('form');
+    form.method = 'post';
+    form.action = '/add_magnet';
+    form.style.display = 'inline';
+    [['sid', sid], ['id', e.Id], ['page', 1]].forEach(function(f) {
+        var input = document.createElement('input');
+        input.type = 'hidden';
+        input.name = f[0];
+        input.value = f[1];
+        form.appendChild(input);
+    });
+    var button = document.createElement('button');
+    button.type = 'submit';
+    button.className = 'add-btn';
+    button.textContent = '➕ Add to Transmission';
+    form.appendChild(button);
+    item.appendChild(title);
+    item.appendChild(meta);
+    item.appendChild(form);
+    return item;
+}
+
+function renderResults(data) {
+    var list = document.getElementById('liveList');
+    list.replaceChildren.apply(list, data.results.map(function(e) { return torrentItem(e, data.sid); }));
+    document.getElementById('liveCount').textContent =
+        'Found ' + data.total + ' torrent' + (data.total !== 1 ? 's' : '');
+}
+
+document.getElementById('searchForm').addEventListener('submit', function(ev) {
+    if (!window.EventSource) return;
+    ev.preventDefault();
+    if (source) source.close();
+    var staticResults = document.getElementById('staticResults');
+    if (staticResults) staticResults.remove();
+    document.getElementById('liveResults').hidden = false;
+    document.getElementById('liveCount').textContent = 'Searching...';
+    document.getElementById('liveList').replaceChildren();
+    document.getElementById('livePager').hidden = true;
+    var progress = document.getElementById('liveProgress');
+    progress.textContent = '';
+
+    var params = new URLSearchParams(new FormData(this));
+    // ?timing=1 on the page asks for the per-stage breakdown of each search
+    var timing = new URLSearchParams(location.search).get('timing') === '1';
+    if (timing) params.set('timing', '1');
+    source = new EventSource('/search/stream?' + params);
+    source.addEventListener('results', function(msg) {
+        var data = JSON.parse(msg.data);
+        renderResults(data);
+        progress.textContent = data.answered + ' indexer' + (data.answered !== 1 ? 's' : '') + ' answered'
+            + (data.failed.length ? ', ' + data.failed.length + ' failed' : '');
+    });
+    source.addEventListener('done', function(msg) {
+        source.close();
+        var data = JSON.parse(msg.data);
+        renderResults(data);
+        // Results are kept server-side, so reloads and "back" re-render them instantly
+        var url = '/?sid=' + encodeURIComponent(data.sid);
+        if (timing) url += '&timing=1';
+        history.replaceState(null, '', url);
+        if (data.pages > 1) {
+            document.getElementById('liveNext').href = url + '&page=2';
+            document.getElementById('livePager').hidden = false;
+        }
+        progress.textContent = data.failed.length ? data.failed.length + ' indexer(s) failed' : 'All indexers answered';
+        progress.title = data.failed.join('\n');
+        if (data.timings) progress.textContent += ' · ' + data.timings;
+    });
+    source.addEventListener('failed', function(msg) {
+        source.close();
+        document.getElementById('liveCount').textContent = JSON.parse(msg.data).error;
+    });
+    source.onerror = function() {
+        source.close();
+        progress.textContent = 'Connection lost';
+    };
+});
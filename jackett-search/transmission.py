@@ -0,0 +1,104 @@
+import threading
+import time
+
+import metrics
+
+
+class TransmissionError(Exception):
+    pass
+
+
+class TransmissionClient:
+    """Transmission RPC client that reuses connections and the session id"""
+
+    def __init__(self, url, session, timeout=30):
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+        self.session_id = None
+        self._lock = threading.Lock()
+        self._hashes = {}  # hashString -> torrent id
+        self._hashes_at = None
+
+    def rpc(self, method, arguments=None):
+        """Call an RPC method and return its arguments, retrying once on 409"""
+        payload = {"method": method, "arguments": arguments or {}}
+        with metrics.transmission_call(method):
+            for _ in range(2):
+                response = self.session.post(self.url, json=payload, headers=self._headers(), timeout=self.timeout)
+                if not self._session_expired(response):
+                    return self._arguments(response)
+            raise TransmissionError("Transmission rejected the session ID twice")
+
+    def add_magnet(self, magnet_url):
+        """Add a torrent, returns its torrent-added or torrent-duplicate info"""
+        return self._remember(self.rpc("torrent-add", {"filename": magnet_url}))
+
+    def torrent_hashes(self, max_age=30):
+        """Infohashes of every torrent in the client, from a snapshot at most max_age seconds old"""
+        hashes = self._cached_hashes(max_age)
+        if hashes is None:
+            hashes = self._store_hashes(self.rpc("torrent-get", {"fields": ["id", "hashString"]}))
+        return hashes
+
+    def _headers(self):
+        return {"X-Transmission-Session-Id": self.session_id or ""}
+
+    def _session_expired(self, response):
+        if response.status_code != 409:
+            return False
+        # Session id missing or rotated, Transmission sends the new one
+        with self._lock:
+            self.session_id = response.headers.get("X-Transmission-Session-Id")
+        if not self.session_id:
+            raise TransmissionError("Could not get Transmission session ID")
+        return True
+
+    def _arguments(self, response):
+        if response.status_code != 200:
+            raise TransmissionError(f"HTTP error: {response.status_code}")
+        result = response.json()
+        if result.get("result") != "success":
+            raise TransmissionError(f"Transmission error: {result.get('result', 'Unknown error')}")
+        return result.get("arguments", {})
+
+    def _remember(self, result):
+        torrent = result.get("torrent-added") or result.get("torrent-duplicate") or {}
+        if torrent.get("hashString"):
+            with self._lock:
+                self._hashes[torrent["hashString"].lower()] = torrent.get("id")
+        return torrent
+
+    def _cached_hashes(self, max_age):
+        with self._lock:
+            if self._hashes_at is not None and time.monotonic() - self._hashes_at < max_age:
+                return dict(self._hashes)
+        return None
+
+    def _store_hashes(self, result):
+        with self._lock:
+            self._hashes = {t["hashString"].lower(): t["id"] for t in result.get("torrents", [])}
+            self._hashes_at = time.monotonic()
+            return dict(self._hashes)
+
+
+class AsyncTransmissionClient(TransmissionClient):
+    """Same client for asyncio, session is an httpx.AsyncClient"""
+
+    async def rpc(self, method, arguments=None):
+        payload = {"method": method, "arguments": arguments or {}}
+        with metrics.transmission_call(method):
+            for _ in range(2):
+                response = await self.session.post(self.url, json=payload, headers=self._headers(), timeout=self.timeout)
+                if not self._session_expired(response):
+                    return self._arguments(response)
+            raise TransmissionError("Transmission rejected the session ID twice")
+
+    async def add_magnet(self, magnet_url):
+        return self._remember(await self.rpc("torrent-add", {"filename": magnet_url}))
+
+    async def torrent_hashes(self, max_age=30):
+        hashes = self._cached_hashes(max_age)
+        if hashes is None:
+            hashes = self._store_hashes(await self.rpc("torrent-get", {"fields": ["id", "hashString"]}))
+        return hashes
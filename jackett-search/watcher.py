@@ -0,0 +1,238 @@
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from jackett import API_KEY, fetch_results, normalize_query, search_cache
+from ranking import RankedResults, dedup_key
+from resolver import UNRESOLVED, resolve_many
+
+WATCH_PATH = os.getenv(
+    "WATCH_PATH",
+    os.path.expanduser("~/.cache/jackett-search/watches.sqlite3"),
+)
+WATCH_ENABLED = os.getenv("WATCH_ENABLED", "1") == "1"
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", 3600))  # seconds between runs of a watch
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", 300))  # seconds, floor for any watch
+WATCH_JITTER = float(os.getenv("WATCH_JITTER", 0.2))  # +/- fraction of the interval
+WATCH_MATCHES = int(os.getenv("WATCH_MATCHES", 50))  # recent matches listed per watch
+
+# Outcomes left out of the seen set, so the next run picks the torrent up again
+RETRY = ("unresolved", "failed")
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY,
+    query TEXT NOT NULL,
+    min_size REAL,
+    max_size REAL,
+    min_seeders INTEGER,
+    auto_add_seeders INTEGER,
+    interval REAL NOT NULL,
+    next_run REAL NOT NULL,
+    last_run REAL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS seen (
+    watch_id INTEGER NOT NULL REFERENCES watches (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    size_gb REAL NOT NULL,
+    seeders INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    found_at REAL NOT NULL,
+    PRIMARY KEY (watch_id, key)
+);
+CREATE INDEX IF NOT EXISTS seen_found ON seen (watch_id, found_at);
+"""
+
+_FIELDS = ("id", "query", "min_size", "max_size", "min_seeders", "auto_add_seeders",
+           "interval", "next_run", "last_run", "last_error")
+
+
+def _connect():
+    """Per-thread connection, the watcher thread and request threads use it at once"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(WATCH_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(WATCH_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _jittered(interval):
+    return interval * random.uniform(1 - WATCH_JITTER, 1 + WATCH_JITTER)
+
+
+def _watch(row):
+    return dict(zip(_FIELDS, row))
+
+
+def add_watch(query, min_size=None, max_size=None, min_seeders=None, auto_add_seeders=None, interval=None):
+    """
+    Save a search to run on a schedule, returns the new watch.
+
+    New matches with at least auto_add_seeders seeders are added to
+    Transmission, None only records them. The first run is spread over the
+    interval so watches saved together don't hit Jackett together.
+    """
+    if not interval or not math.isfinite(interval):
+        interval = WATCH_INTERVAL
+    interval = max(interval, WATCH_MIN_INTERVAL)
+    next_run = time.time() + random.uniform(0, interval * WATCH_JITTER)
+    cursor = _connect().execute(
+        "INSERT INTO watches (query, min_size, max_size, min_seeders, auto_add_seeders, interval, next_run)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (query, min_size, max_size, min_seeders, auto_add_seeders, interval, next_run),
+    )
+    return get_watch(cursor.lastrowid)
+
+
+def get_watch(watch_id):
+    row = _connect().execute(
+        f"SELECT {', '.join(_FIELDS)} FROM watches WHERE id = ?", (watch_id,)
+    ).fetchone()
+    return _watch(row) if row else None
+
+
+def list_watches():
+    """Every watch with its most recent matches, newest first"""
+    conn = _connect()
+    watches = [_watch(row) for row in conn.execute(f"SELECT {', '.join(_FIELDS)} FROM watches ORDER BY id")]
+    for watch in watches:
+        watch["matches"] = [
+            {"title": title, "size_gb": size_gb, "seeders": seeders, "status": status, "found_at": found_at}
+            for title, size_gb, seeders, status, found_at in conn.execute(
+                "SELECT title, size_gb, seeders, status, found_at FROM seen"
+                " WHERE watch_id = ? AND status != 'baseline' ORDER BY found_at DESC LIMIT ?",
+                (watch["id"], WATCH_MATCHES),
+            )
+        ]
+    return watches
+
+
+def delete_watch(watch_id):
+    return _connect().execute("DELETE FROM watches WHERE id = ?", (watch_id,)).rowcount > 0
+
+
+def _key(entry):
+    kind, value = dedup_key(entry)
+    return f"{kind}:{value}"
+
+
+class Watcher:
+    """
+    Runs saved searches in a background thread.
+
+    Each run fetches the query once, applies the watch's filters and diffs
+    the results by infohash against everything the watch has seen before.
+    Only new torrents are resolved and, above the watch's seeder threshold,
+    handed to add_magnets. The first run of a watch only records a baseline.
+    """
+
+    def __init__(self, add_magnets):
+        self.add_magnets = add_magnets
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="watcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Re-check the schedule now, after watches were added or changed"""
+        self._wake.set()
+
+    def run_now(self, watch_id):
+        _connect().execute("UPDATE watches SET next_run = ? WHERE id = ?", (time.time(), watch_id))
+        self.wake()
+
+    def _loop(self):
+        while True:
+            try:
+                delay = self._run_due()
+            except Exception as e:
+                print(f"Watcher failed: {e}")
+                delay = WATCH_MIN_INTERVAL
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def _run_due(self):
+        """Run every due watch, returns seconds until the next one is due"""
+        conn = _connect()
+        now = time.time()
+        due = [_watch(row) for row in conn.execute(
+            f"SELECT {', '.join(_FIELDS)} FROM watches WHERE next_run <= ? ORDER BY next_run", (now,)
+        )]
+        for watch in due:
+            error = None
+            try:
+                self.run(watch)
+            except Exception as e:
+                error = str(e)
+                print(f"Watch {watch['query']!r} failed: {e}")
+            conn.execute(
+                "UPDATE watches SET last_run = ?, next_run = ?, last_error = ? WHERE id = ?",
+                (time.time(), time.time() + _jittered(watch["interval"]), error, watch["id"]),
+            )
+        (next_run,) = conn.execute("SELECT MIN(next_run) FROM watches").fetchone()
+        return WATCH_MIN_INTERVAL if next_run is None else max(1.0, next_run - time.time())
+
+    def run(self, watch):
+        """Run one watch, returns the new items it found"""
+        if not API_KEY:
+            raise ValueError("JACKETT_API_KEY environment variable is not set")
+        key = normalize_query(watch["query"])
+        results = fetch_results(key)
+        # Page searches for the same query get the fresh results for free
+        search_cache.put(key, results)
+
+        ranked = RankedResults(watch["query"], watch["min_size"], watch["max_size"], watch["min_seeders"])
+        ranked.add(results)
+        conn = _connect()
+        seen = {k for (k,) in conn.execute("SELECT key FROM seen WHERE watch_id = ?", (watch["id"],))}
+        new = [item for item in ranked.items if _key(item["entry"]) not in seen]
+        if not new:
+            return []
+
+        statuses = {id(item): "new" for item in new}
+        if watch["last_run"] is None:
+            statuses = {id(item): "baseline" for item in new}
+        elif watch["auto_add_seeders"] is not None:
+            wanted = [item for item in new if item["Seeders"] >= watch["auto_add_seeders"]]
+            self._add(wanted, statuses)
+
+        # Failed adds stay unseen so the next run tries them again
+        now = time.time()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen (watch_id, key, title, size_gb, seeders, status, found_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(watch["id"], _key(item["entry"]), item["Title"], item["SizeGB"], item["Seeders"],
+                  statuses[id(item)], now) for item in new if statuses[id(item)] not in RETRY],
+            )
+        print(f"Watch {watch['query']!r}: {len(new)} new")
+        return new
+
+    def _add(self, items, statuses):
+        """Resolve only the new items being added and queue them in Transmission"""
+        to_add = []
+        for item, magnet in zip(items, resolve_many([item["entry"] for item in items])):
+            if magnet and magnet != UNRESOLVED:
+                to_add.append((item, magnet))
+            else:
+                statuses[id(item)] = "unresolved"
+        if to_add:
+            results = self.add_magnets([magnet for _, magnet in to_add])
+            for (item, _), result in zip(to_add, results):
+                statuses[id(item)] = result["status"]
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Refresh only the Plex folders of torrents that just finished downloading.
+
+Polls Transmission for recently active torrents, notes those whose
+percentDone reached 1 and, once no other torrent has finished for
+PLEX_DEBOUNCE seconds, asks Plex for a partial scan of just their folders.
+Replaces the full library scan from cron.
+"""
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+# Reuses the Transmission client and connection pool of the jackett-search app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "jackett-search"))
+
+from http_pool import session  # noqa: E402
+from transmission import TransmissionClient  # noqa: E402
+
+TRANSMISSION_HOST = os.getenv("TRANSMISSION_HOST", "127.0.0.1")
+TRANSMISSION_PORT = os.getenv("TRANSMISSION_PORT", "9091")
+TRANSMISSION_URL = f"http://{TRANSMISSION_HOST}:{TRANSMISSION_PORT}/transmission/rpc"
+
+PLEX_URL = os.getenv("PLEX_URL", "http://127.0.0.1:32400")
+PLEX_TOKEN = os.getenv("PLEX_TOKEN")
+PLEX_SECTION = os.getenv("PLEX_SECTION")  # library section id, found from the path when unset
+# "transmission dir=plex dir" when the two see the download folder under different paths
+PLEX_PATH_MAP = os.getenv("PLEX_PATH_MAP", "")
+
+PLEX_POLL = float(os.getenv("PLEX_POLL", 15))  # seconds between Transmission polls
+PLEX_DEBOUNCE = float(os.getenv("PLEX_DEBOUNCE", 60))  # quiet seconds before refreshing
+PLEX_FULL_EVERY = float(os.getenv("PLEX_FULL_EVERY", 600))  # seconds between full torrent lists
+
+FIELDS = ["id", "hashString", "name", "percentDone", "downloadDir"]
+
+
+def plex_path(path):
+    """Transmission's view of a path translated to Plex's"""
+    source, _, target = PLEX_PATH_MAP.partition("=")
+    if source and target and (path == source or path.startswith(source.rstrip("/") + "/")):
+        return target.rstrip("/") + path[len(source.rstrip("/")):]
+    return path
+
+
+def torrent_path(torrent):
+    """Folder to scan for a torrent, its own folder or the download folder for single files"""
+    path = os.path.join(torrent["downloadDir"], torrent["name"])
+    return path if os.path.isdir(path) else torrent["downloadDir"]
+
+
+def collapse(paths):
+    """Drop paths inside another path of the set, one scan covers them"""
+    kept = []
+    for path in sorted(paths):
+        if not kept or not path.startswith(kept[-1].rstrip("/") + "/"):
+            kept.append(path)
+    return kept
+
+
+class Plex:
+    def __init__(self, url, token, section=None):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.section = section
+        self._locations = None  # [(path, section id)] longest first
+
+    def _get(self, endpoint, **params):
+        r = session.get(f"{self.url}{endpoint}", params={"X-Plex-Token": self.token, **params}, timeout=30)
+        r.raise_for_status()
+        return r
+
+    def section_for(self, path):
+        if self.section:
+            return self.section
+        for refetch in (False, True):
+            if refetch or self._locations is None:
+                self._locations = sorted(
+                    ((location.get("path"), directory.get("key"))
+                     for directory in ET.fromstring(self._get("/library/sections").content).iter("Directory")
+                     for location in directory.iter("Location")),
+                    key=lambda pair: len(pair[0]), reverse=True,
+                )
+            for location, key in self._locations:
+                if path == location or path.startswith(location.rstrip("/") + "/"):
+                    return key
+        return None
+
+    def refresh(self, path):
+        """Partial scan of one folder, False when no library contains it"""
+        section = self.section_for(path)
+        if section is None:
+            return False
+        self._get(f"/library/sections/{section}/refresh", path=path)
+        return True
+
+
+class RefreshWatcher:
+    """Finished torrents in, debounced partial Plex scans out"""
+
+    def __init__(self, transmission, plex):
+        self.transmission = transmission
+        self.plex = plex
+        self.done = {}  # hashString -> finished
+        self.pending = {}  # plex path -> monotonic time it last finished a torrent
+        self._full_at = None
+
+    def poll(self):
+        """Record torrents that finished since the last poll, returns their paths"""
+        full = self._full_at is None or time.monotonic() - self._full_at >= PLEX_FULL_EVERY
+        arguments = {"fields": FIELDS}
+        if not full:
+            arguments["ids"] = "recently-active"
+        result = self.transmission.rpc("torrent-get", arguments)
+        baseline = self._full_at is None
+        if full:
+            self._full_at = time.monotonic()
+
+        finished = []
+        for torrent in result.get("torrents", []):
+            key = torrent["hashString"]
+            complete = torrent["percentDone"] >= 1
+            # The first list only records what is already there
+            if complete and not self.done.get(key, baseline):
+                finished.append(torrent)
+            self.done[key] = complete
+        if full:
+            listed = {t["hashString"] for t in result.get("torrents", [])}
+            self.done = {k: v for k, v in self.done.items() if k in listed}
+
+        paths = [plex_path(torrent_path(torrent)) for torrent in finished]
+        for torrent, path in zip(finished, paths):
+            print(f"Finished: {torrent['name']} -> {path}")
+            self.pending[path] = time.monotonic()
+        return paths
+
+    def flush(self):
+        """Scan the pending folders once nothing has finished for PLEX_DEBOUNCE seconds"""
+        if not self.pending or time.monotonic() - max(self.pending.values()) < PLEX_DEBOUNCE:
+            return []
+        refreshed = []
+        for path in collapse(self.pending):
+            try:
+                if self.plex.refresh(path):
+                    print(f"Refreshed Plex for {path}")
+                else:
+                    print(f"No Plex library contains {path}, skipped")
+                refreshed.append(path)
+            except Exception as e:
+                # Kept pending, retried after the next poll
+                print(f"Plex refresh failed for {path}: {e}")
+        for path in list(self.pending):
+            if any(path == p or path.startswith(p.rstrip("/") + "/") for p in refreshed):
+                del self.pending[path]
+        return refreshed
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Transmission poll failed: {e}")
+            self.flush()
+            time.sleep(PLEX_POLL)
+
+
+def main():
+    if not PLEX_TOKEN:
+        sys.exit("PLEX_TOKEN environment variable is not set")
+    print(f"Watching {TRANSMISSION_URL} for finished torrents, refreshing {PLEX_URL}", flush=True)
+    RefreshWatcher(TransmissionClient(TRANSMISSION_URL, session), Plex(PLEX_URL, PLEX_TOKEN, PLEX_SECTION)).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,258 @@
 #!/usr/bin/env python3
 import argparse
-import requests
+import json
+import queue
+import signal
+import socket
+import socketserver
 import sys
 import os
+import threading
+
+# Shares the on-disk magnet cache and the filter-and-rank engine with the jackett-search app.
+# Those modules are imported where they are used, a daemon answering skips them entirely.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "jackett-search"))
 
 API_URL = "http://localhost:9117/api/v2.0/indexers/all/results"
 API_KEY = os.getenv("JACKETT_API_KEY")
 
+QUERY_SOCKET = os.getenv("QUERY_SOCKET", os.path.expanduser("~/.cache/jackett-search/query.sock"))
+QUERY_FRESH_FOR = float(os.getenv("QUERY_FRESH_FOR", 300))  # seconds the daemon serves results as is
+QUERY_STALE_FOR = float(os.getenv("QUERY_STALE_FOR", 1800))  # further seconds served while refreshing
+
+# ranking.SORT_KEYS, listed here so the thin client doesn't import numpy
+SORTS = ("seeders", "size", "age", "score", "relevance")
+
+
+def search(query, in_background=False):
+    """Raw Jackett results, recorded in the history index (by its writer thread in the daemon)"""
+    import history
+    from http_pool import session
+
+    params = {
+        "apikey": API_KEY,
+        "Query": query,
+    }
+    r = session.get(API_URL, params=params, timeout=120)
+    r.raise_for_status()
+    results = r.json().get("Results", [])
+    # A one-shot run exits right after, it writes before returning
+    if in_background:
+        history.record_later(results)
+    else:
+        history.record(results)
+    return results
+
+
+def resolve_streaming(items, jobs):
+    """
+    Resolve magnets for ranked items on jobs threads, yield (item, magnet) as each finishes.
+
+    Closing the generator early leaves queued items unresolved. The threads are
+    daemons, so a slow tracker still answering never holds up the exit.
+    """
+    # The web app's resolver: same magnet cache, RESOLVE_TIMEOUT and metrics
+    from resolver import resolve_magnet
+
+    pending = queue.Queue()
+    for item in items:
+        pending.put(item)
+    finished = queue.Queue()
+    stop = threading.Event()
+
+    def work():
+        while not stop.is_set():
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                return
+            finished.put((item, resolve_magnet(item["entry"])))
+
+    for _ in range(min(jobs, len(items))):
+        threading.Thread(target=work, daemon=True).start()
+    try:
+        for _ in range(len(items)):
+            yield finished.get()
+    finally:
+        stop.set()
+
+
+def to_record(item, magnet):
+    """One NDJSON line"""
+    entry = item["entry"]
+    return {
+        "title": item["Title"],
+        "size_gb": item["SizeGB"],
+        "seeders": item["Seeders"],
+        "peers": item["Peers"],
+        "sources": item["Sources"],
+        "tracker": entry.get("Tracker"),
+        "published": entry.get("PublishDate"),
+        "magnet": magnet,
+    }
 
-def resolve_magnet(entry):
+
+def run(args, out, status, fetch=search):
     """
-    Extract magnet link from an entry:
-    1. MagnetUri field
-    2. Guid if it's a magnet
-    3. Link -> request -> Location header
+    Search, filter, rank and resolve, handing each printable result to out().
+
+    Used in-process and by the daemon alike. status() gets the messages that
+    aren't results, fetch() returns raw Jackett results for a query.
     """
-    if entry.get("MagnetUri"):
-        return entry["MagnetUri"]
+    import history
+    from ranking import RankedResults, sort_items
 
-    if entry.get("Guid", "").startswith("magnet:?"):
-        return entry["Guid"]
+    results = history.search(args.query) if args.history else fetch(args.query)
 
-    if entry.get("Link"):
+    if not results:
+        status("No results found.")
+        return
+
+    # Same filters, infohash dedup and ranking as the web app
+    ranked = RankedResults(args.query, args.min_size_gb, args.max_size_gb, args.min_seeders, relevance=args.history)
+    ranked.add(results)
+    sort = args.sort or ("relevance" if args.history else "seeders")
+
+    # Lookups start in ranked order, results print in the order they resolve
+    shown = 0
+    for item, magnet in resolve_streaming(sort_items(ranked.items, sort), max(1, args.jobs)):
+        if not magnet:
+            continue
+
+        if args.ndjson:
+            out(json.dumps(to_record(item, magnet)))
+        else:
+            out(f"{item['Title']}\n  Size: {item['SizeGB']:.2f} GB | Seeders: {item['Seeders']} | Peers: {item['Peers']}\n"
+                f"  Magnet: {magnet}\n")
+        shown += 1
+        if args.limit and shown >= args.limit:
+            break
+
+    if not shown:
+        status("No results matched the filters.")
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """One search per connection: a JSON line of arguments in, NDJSON messages out"""
+
+    def handle(self):
+        request = self.rfile.readline()
+        if not request:
+            return  # daemon_running() probing
         try:
-            r = requests.get(entry["Link"], allow_redirects=False, timeout=10)
-            if "Location" in r.headers and r.headers["Location"].startswith("magnet:?"):
-                return r.headers["Location"]
-        except Exception as e:
-            sys.stderr.write(f"Error resolving Link for {entry.get('Title')}: {e}\n")
-    return None
+            args = argparse.Namespace(**json.loads(request))
+            try:
+                run(args, lambda line: self.send(out=line), lambda line: self.send(status=line),
+                    self.server.fetch)
+            except Exception as e:
+                self.send(error=str(e))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (--limit, head, fzf closed)
+            pass
 
+    def send(self, **message):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
 
-def human_size(bytes_val):
-    gb = bytes_val / (1024 ** 3)
-    return f"{gb:.2f} GB"
 
+def serve():
+    """Stay resident with warm imports, connection pool and result cache"""
+    from caching import StaleWhileRevalidate
+    from jackett import normalize_query
+    import ranking  # noqa: F401
 
-def search(query):
-    params = {
-        "apikey": API_KEY,
-        "Query": query,
-    }
-    r = requests.get(API_URL, params=params, timeout=120)
-    r.raise_for_status()
-    return r.json().get("Results", [])
+    if daemon_running():
+        sys.exit(f"A daemon is already listening on {QUERY_SOCKET}")
+    if os.path.exists(QUERY_SOCKET):
+        os.unlink(QUERY_SOCKET)  # left behind by a daemon that was killed
+    os.makedirs(os.path.dirname(QUERY_SOCKET) or ".", exist_ok=True)
 
+    server = socketserver.ThreadingUnixStreamServer(QUERY_SOCKET, DaemonHandler)
+    server.daemon_threads = True
+    # Repeat searches are answered from memory, stale ones refresh in the background
+    cache = StaleWhileRevalidate(lambda query: search(query, in_background=True), 64,
+                                 QUERY_FRESH_FOR, QUERY_STALE_FOR)
+    server.fetch = lambda query: cache.get(normalize_query(query))
+    os.chmod(QUERY_SOCKET, 0o600)
+    # systemctl stop sends SIGTERM, exit through the finally below to remove the socket
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Listening on {QUERY_SOCKET}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        os.unlink(QUERY_SOCKET)
 
-def passes_filters(entry, query_clauses, min_size_gb, max_size_gb, min_seeders):
-    # Size filter
-    size_gb = entry.get("Size", 0) / (1024 ** 3)
-    if min_size_gb is not None and size_gb < min_size_gb:
-        return False
-    if max_size_gb is not None and size_gb > max_size_gb:
-        return False
 
-    # Seeder filter
-    seeders = entry.get("Seeders", 0)
-    if min_seeders is not None and seeders < min_seeders:
+def daemon_running():
+    try:
+        with socket.socket(socket.AF_UNIX) as sock:
+            sock.connect(QUERY_SOCKET)
+        return True
+    except OSError:
         return False
 
-    # Query clause filter
-    title = entry.get("Title", "").lower()
-    for clause in query_clauses:
-        if clause not in title:
-            return False
 
+def ask_daemon(args):
+    """Run the search in the daemon and print what it sends, False when no daemon is listening"""
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.connect(QUERY_SOCKET)
+    except OSError:
+        sock.close()
+        return False
+
+    status = sys.stderr if args.ndjson else sys.stdout
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall(json.dumps(vars(args)).encode() + b"\n")
+        for line in replies:
+            message = json.loads(line)
+            if "out" in message:
+                print(message["out"], flush=True)
+            elif "status" in message:
+                print(message["status"], file=status)
+            else:
+                sys.exit(f"Search failed: {message['error']}")
     return True
 
 
 def main():
     parser = argparse.ArgumentParser(description="Jackett Torrent Search Tool")
-    parser.add_argument("--query", required=True, help="Search query string")
+    parser.add_argument("--query", help="Search query string")
     parser.add_argument("--min-size-gb", type=float, help="Minimum size in GB")
     parser.add_argument("--max-size-gb", type=float, help="Maximum size in GB")
     parser.add_argument("--min-seeders", type=int, help="Minimum number of seeders")
+    parser.add_argument("--history", action="store_true",
+                        help="Search everything Jackett returned before, instantly and offline")
+    parser.add_argument("--sort", choices=SORTS,
+                        help="Order of the results, score weighs seeders, peers and age. "
+                             "Default seeders, relevance with --history")
+    parser.add_argument("--jobs", type=int, default=8, help="Magnets resolved at once")
+    parser.add_argument("--limit", type=int, help="Stop once this many magnets are resolved")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="One JSON object per line, each printed as soon as its magnet resolves")
+    parser.add_argument("--daemon", action="store_true",
+                        help=f"Stay resident and answer searches on {QUERY_SOCKET}")
+    parser.add_argument("--no-daemon", action="store_true", help="Search in this process even if a daemon runs")
     args = parser.parse_args()
 
-    query_clauses = args.query.lower().split()
-    results = search(args.query)
-
-    if not results:
-        print("No results found.")
+    if args.daemon:
+        serve()
         return
+    if not args.query:
+        parser.error("--query is required")
+    no_daemon = args.no_daemon
+    del args.daemon, args.no_daemon
 
-    shown = False
-    for entry in results:
-        if not passes_filters(entry, query_clauses, args.min_size_gb, args.max_size_gb, args.min_seeders):
-            continue
-
-        magnet = resolve_magnet(entry)
-        if not magnet:
-            continue
-
-        title = entry.get("Title", "N/A")
-        size = human_size(entry.get("Size", 0))
-        peers = entry.get("Peers", 0)
-        seeders = entry.get("Seeders", 0)
-
-        print(f"{title}\n  Size: {size} | Seeders: {seeders} | Peers: {peers}")
-        print(f"  Magnet: {magnet}\n")
-        shown = True
-
-    if not shown:
-        print("No results matched the filters.")
+    try:
+        if no_daemon or not ask_daemon(args):
+            # Keep stdout machine-readable in NDJSON mode
+            status = sys.stderr if args.ndjson else sys.stdout
+            run(args, lambda line: print(line, flush=True), lambda line: print(line, file=status))
+    except BrokenPipeError:
+        # The reader (fzf, head) has gone, don't fail again flushing at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     main()
-
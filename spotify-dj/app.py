@@ -1,5 +1,8 @@
 import threading
+import io
 import os
+import queue
+import subprocess
 import requests
 import base64
 import pygame
@@ -9,7 +12,9 @@ import logging
 from flask import Flask, request, jsonify
 from openai import OpenAI
 from pydantic import BaseModel
-from typing import Tuple, List
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Union
 
 # Configure logging to ensure stdout is not buffered
 logging.basicConfig(
@@ -22,6 +27,15 @@ logging.basicConfig(
 )
 
 SPOTIFY_DEVICE_ID = os.getenv("SPOTIFY_DEVICE_ID")
+SPOTIFY_API = "https://api.spotify.com/v1"
+TOKEN_REFRESH_MARGIN = float(os.getenv("TOKEN_REFRESH_MARGIN", 300))  # seconds before expiry to refresh
+INTRO_JITTER_MS = int(os.getenv("INTRO_JITTER_MS", 300))  # decoded audio buffered before a streamed intro starts
+INTRO_BLOCK_MS = 200  # audio per queued block of a streamed intro
+RECOMMEND_ATTEMPTS = int(os.getenv("RECOMMEND_ATTEMPTS", 3))  # recommendations tried until one is on Spotify
+DJ_LOOKAHEAD = max(1, int(os.getenv("DJ_LOOKAHEAD", 2)))  # songs kept ready with their intros in memory
+DJ_RESYNC = float(os.getenv("DJ_RESYNC", 60))  # seconds between playback checks while a track plays
+DJ_PAUSED_POLL = float(os.getenv("DJ_PAUSED_POLL", 10))  # seconds between checks while paused
+DJ_INTRO_GAP = float(os.getenv("DJ_INTRO_GAP", 1))  # seconds of silence between intro and track
 
 # Helper function to ensure logs are flushed immediately
 def log(msg: str):
@@ -38,11 +52,22 @@ class SongRecommendation(BaseModel):
     introduction: str
 
 
-def exchange_token():
-    """Exchange refresh token for access token"""
+@dataclass
+class Song:
+    """A recommendation ready to serve: resolved track and its spoken intro"""
+    query: str
+    introduction: str
+    uri: str
+    name: str
+    artist: str
+    duration_ms: int
+    audio: Optional[bytes] = None  # mp3, None when the intro is to be streamed
+
+
+def request_token(refresh_token: str):
+    """Exchange refresh token for access token, returns the token response"""
     client_id = os.getenv("SPOTIFY_CLIENT_ID")
     client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
-    refresh_token = os.getenv("SPOTIFY_REFRESH_TOKEN")
     
     if not all([client_id, client_secret, refresh_token]):
         raise RuntimeError("Missing Spotify credentials")
@@ -64,11 +89,85 @@ def exchange_token():
         "refresh_token": refresh_token
     }
     
-    response = requests.post("https://accounts.spotify.com/api/token", headers=headers, data=data)
+    response = http.post("https://accounts.spotify.com/api/token", headers=headers, data=data, timeout=10)
     if response.status_code != 200:
         raise RuntimeError(f"Token exchange failed: {response.text}")
     
-    return response.json()["access_token"]
+    return response.json()
+
+
+class SpotifyTokens:
+    """
+    Access token cached for its lifetime instead of exchanged on every call.
+
+    A timer refreshes it TOKEN_REFRESH_MARGIN seconds before it expires, and
+    callers arriving while a refresh runs wait for that one instead of
+    starting their own.
+    """
+
+    def __init__(self, refresh_token: str, margin: float = TOKEN_REFRESH_MARGIN):
+        self.refresh_token = refresh_token
+        self.margin = margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def get(self) -> str:
+        token = self._token
+        if token and time.monotonic() < self._expires_at:
+            return token
+        return self.refresh(token)
+
+    def refresh(self, stale: str = None) -> str:
+        """New token unless another caller already replaced stale meanwhile"""
+        with self._lock:
+            if self._token and self._token != stale and time.monotonic() < self._expires_at:
+                return self._token
+            data = request_token(self.refresh_token)
+            # Spotify may rotate the refresh token
+            self.refresh_token = data.get("refresh_token") or self.refresh_token
+            expires_in = float(data.get("expires_in", 3600))
+            self._token = data["access_token"]
+            self._expires_at = time.monotonic() + expires_in
+            self._schedule(max(1.0, expires_in - self.margin))
+            log(f"[tokens] Spotify token refreshed, valid for {expires_in:.0f}s")
+            return self._token
+
+    def _schedule(self, delay: float):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh_ahead)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh_ahead(self):
+        try:
+            self.refresh(self._token)
+        except Exception as e:
+            log(f"[tokens] Background refresh failed, retrying in 30s: {e}")
+            self._schedule(30)
+
+
+http = requests.Session()  # keep-alive connections to the Spotify API
+tokens = SpotifyTokens(os.getenv("SPOTIFY_REFRESH_TOKEN"))
+
+
+def exchange_token():
+    """Current access token, exchanged only when the cached one expired"""
+    return tokens.get()
+
+
+def spotify_api(method: str, path: str, **kwargs):
+    """Spotify Web API call with the cached token, refreshed and retried once on 401"""
+    kwargs.setdefault("timeout", 10)
+    token = tokens.get()
+    response = http.request(method, f"{SPOTIFY_API}{path}", headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    if response.status_code == 401:
+        log(f"[spotify_api] 401 on {path}, refreshing token")
+        token = tokens.refresh(token)
+        response = http.request(method, f"{SPOTIFY_API}{path}", headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    return response
 
 
 def setup_soundbar():
@@ -124,36 +223,158 @@ Ensure smooth transitioning from previous songs and introductions. The experienc
     except Exception as e:
         raise RuntimeError(f"OpenAI API failed: {e}")
 
-def speak_text(text: str, filename="intro.mp3"):
-    """Generate TTS audio using official OpenAI library"""
-    try:
-
-        instructions = f"""
+TTS_OPTIONS = {
+    "model": "gpt-4o-mini-tts",
+    "voice": "verse",
+    "instructions": """
 Voice: Deep and resonant, with a velvety timbre that carries warmth and gravity. Each word feels grounded, like the voice of someone who has lived many lives and listens as deeply as they speak. But not snobby. Not too slow.
 Tone: Reflective and soulful, with a calm, measured delivery. Emphasizes serenity and emotional depth rather than excitement, guiding the listener into a contemplative atmosphere. But not too slow.
 Dialect: Neutral, clear, and articulate — no regionalisms. A subtle hint of poetic phrasing in everyday words, like a philosopher speaking casually but beautifully.
 Pronunciation: Smooth and deliberate, with rounded vowels and softly emphasized consonants. Slight elongation of key words to let them linger in the air, like notes of music.
-"""
+""",
+    "response_format": "mp3",
+}
 
-        response = client.audio.speech.create(
-            model="gpt-4o-mini-tts",
-            voice="verse",
-            input=text,
-            instructions=instructions,
-            response_format="mp3",
-        )
-        
-        with open(filename, "wb") as f:
+
+def synthesize(text: str, cancel: threading.Event = None) -> Optional[bytes]:
+    """TTS audio as mp3 bytes, None if cancel was set before it finished"""
+    audio = io.BytesIO()
+    try:
+        with client.audio.speech.with_streaming_response.create(input=text, **TTS_OPTIONS) as response:
             for chunk in response.iter_bytes(chunk_size=4096):
-                if chunk:
-                    f.write(chunk)
-        
-        return filename
+                if cancel and cancel.is_set():
+                    return None
+                audio.write(chunk)
     except Exception as e:
         raise RuntimeError(f"TTS failed: {str(e)}")
+    return audio.getvalue()
+
+
+def speak_text(text: str, filename="intro.mp3"):
+    """Generate TTS audio using official OpenAI library"""
+    audio = synthesize(text)
+    with open(filename, "wb") as f:
+        f.write(audio)
+    return filename
+
+
+def init_mixer():
+    """
+    Pre-initialize mixer with stable, compatible settings if not already done.
+    This prevents sample-rate mismatches that cause flickering.
+    """
+    if not pygame.mixer.get_init():
+        try:
+            # Frequency: 44100 Hz (standard TTS rate)
+            # Size: -16 (signed 16-bit)
+            # Channels: 2 (stereo, safe for mono files)
+            # Buffer: 4096 (large enough to avoid underruns, small enough for latency)
+            pygame.mixer.pre_init(frequency=44100, size=-16, channels=2, buffer=4096)
+            pygame.mixer.init()
+            log("Mixer initialized with 44100 Hz, 16-bit, stereo, buffer=4096")
+        except Exception as e:
+            log(f"Warning: pre_init failed, falling back to default: {e}")
+            pygame.mixer.init(buffer=4096)
+    return pygame.mixer.get_init()
+
 
+def stream_intro(text: str, filename: str = None, volume: float = 1.0):
+    """
+    Speak text while it is still being synthesized.
+
+    TTS chunks are piped through ffmpeg into raw PCM in the mixer's format and
+    queued on a pygame channel in INTRO_BLOCK_MS blocks; playback starts once
+    INTRO_JITTER_MS are decoded, so the first sound comes after the first chunk
+    instead of the whole synthesis. The mp3 is teed to filename for replays.
+    """
+    frequency, size, channels = init_mixer()
+    frame = abs(size) // 8 * channels
+    decoder = subprocess.Popen(
+        ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+         "-f", f"s{abs(size)}le", "-ar", str(frequency), "-ac", str(channels), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+    )
+    failed = []
 
-def play_intro(filename: str, volume: float = 1.0):
+    def feed():
+        partial = f"{filename}.part" if filename else None
+        try:
+            with client.audio.speech.with_streaming_response.create(input=text, **TTS_OPTIONS) as response:
+                with open(partial, "wb") if partial else open(os.devnull, "wb") as cache:
+                    for chunk in response.iter_bytes(chunk_size=4096):
+                        decoder.stdin.write(chunk)
+                        decoder.stdin.flush()
+                        cache.write(chunk)
+            if partial:
+                # Only a complete intro replaces the cached one
+                os.replace(partial, filename)
+        except Exception as e:
+            failed.append(e)
+            if partial and os.path.exists(partial):
+                os.remove(partial)
+        finally:
+            try:
+                decoder.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    # Drained as fast as ffmpeg decodes so playback speed never holds up the download
+    blocks = queue.Queue()
+    block = frequency * frame * INTRO_BLOCK_MS // 1000 // frame * frame
+
+    def drain():
+        while True:
+            pcm = decoder.stdout.read(block)
+            whole = pcm[:len(pcm) // frame * frame]
+            if whole:
+                blocks.put(whole)
+            if len(pcm) < block:
+                blocks.put(None)
+                return
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    reader = threading.Thread(target=drain, daemon=True)
+    feeder.start()
+    reader.start()
+    try:
+        channel = pygame.mixer.find_channel(True)
+        channel.set_volume(max(0.0, min(1.0, volume)))
+        # Jitter buffer: the first sound holds INTRO_JITTER_MS of audio
+        first, pcm = b"", b""
+        while pcm is not None and len(first) < frequency * frame * INTRO_JITTER_MS // 1000:
+            pcm = blocks.get()
+            first += pcm or b""
+        if first:
+            channel.play(pygame.mixer.Sound(buffer=first))
+            log(f"Streaming intro at volume {volume}")
+        while pcm is not None:
+            pcm = blocks.get()
+            if pcm is None:
+                break
+            # One block plays and one waits queued, a stalled stream only leaves a short gap
+            while channel.get_queue() is not None:
+                time.sleep(0.01)
+            sound = pygame.mixer.Sound(buffer=pcm)
+            if channel.get_busy():
+                channel.queue(sound)
+            else:
+                channel.play(sound)
+        while channel.get_busy():
+            time.sleep(0.05)
+    except pygame.error as e:
+        raise RuntimeError(f"Pygame audio error: {e}")
+    finally:
+        feeder.join(timeout=5)
+        reader.join(timeout=5)
+        decoder.stdout.close()
+        decoder.wait()
+    if failed:
+        raise RuntimeError(f"TTS failed: {failed[0]}")
+    log("Finished streaming intro")
+    return filename
+
+
+def play_intro(audio: Union[str, bytes], volume: float = 1.0):
     """
     Play audio file robustly using pygame with PipeWire/PulseAudio support.
     Prevents audio flickering and dropout by:
@@ -163,27 +384,18 @@ def play_intro(filename: str, volume: float = 1.0):
     - Not quitting mixer to avoid expensive re-initialization
     
     Args:
-        filename: Path to the audio file.
+        audio: Path to the audio file, or mp3 bytes.
         volume: Float between 0.0 (mute) and 1.0 (max).
     """
     try:
-        if not os.path.exists(filename):
-            raise RuntimeError(f"File does not exist: {filename}")
+        if isinstance(audio, bytes):
+            filename = "intro in memory"
+        else:
+            filename = audio
+            if not os.path.exists(filename):
+                raise RuntimeError(f"File does not exist: {filename}")
 
-        # Pre-initialize mixer with stable, compatible settings if not already done
-        # This prevents sample-rate mismatches that cause flickering
-        if not pygame.mixer.get_init():
-            try:
-                # Frequency: 44100 Hz (standard TTS rate)
-                # Size: -16 (signed 16-bit)
-                # Channels: 2 (stereo, safe for mono files)
-                # Buffer: 4096 (large enough to avoid underruns, small enough for latency)
-                pygame.mixer.pre_init(frequency=44100, size=-16, channels=2, buffer=4096)
-                pygame.mixer.init()
-                log("Mixer initialized with 44100 Hz, 16-bit, stereo, buffer=4096")
-            except Exception as e:
-                log(f"Warning: pre_init failed, falling back to default: {e}")
-                pygame.mixer.init(buffer=4096)
+        init_mixer()
 
         # Stop any existing playback cleanly
         if pygame.mixer.music.get_busy():
@@ -191,7 +403,10 @@ def play_intro(filename: str, volume: float = 1.0):
             time.sleep(0.1)  # Brief pause to let stop complete
 
         # Load the audio file
-        pygame.mixer.music.load(filename)
+        if isinstance(audio, bytes):
+            pygame.mixer.music.load(io.BytesIO(audio), "intro.mp3")
+        else:
+            pygame.mixer.music.load(filename)
 
         # Set volume
         pygame.mixer.music.set_volume(max(0.0, min(1.0, volume)))
@@ -216,86 +431,85 @@ def play_intro(filename: str, volume: float = 1.0):
     except Exception as e:
         raise RuntimeError(f"Audio playback failed: {e}")
 
-def spotify_pause(spotify_token: str):
-    headers = {"Authorization": f"Bearer {spotify_token}", "Content-Type": "application/json"}
-
-    resp = requests.put(
-        "https://api.spotify.com/v1/me/player/pause",
-        headers=headers,
-        params={"device_id": SPOTIFY_DEVICE_ID}
-    )
+def spotify_pause():
+    resp = spotify_api("PUT", "/me/player/pause", params={"device_id": SPOTIFY_DEVICE_ID})
     if resp.status_code not in (200, 204):
         raise RuntimeError(f"Pause failed: {resp.status_code} – {resp.text}")
 
-def spotify_resume(spotify_token: str):
-    headers = {"Authorization": f"Bearer {spotify_token}", "Content-Type": "application/json"}
-
-    resp = requests.put(
-        "https://api.spotify.com/v1/me/player/play",
-        headers=headers,
-        params={"device_id": SPOTIFY_DEVICE_ID}
-    )
+def spotify_resume():
+    resp = spotify_api("PUT", "/me/player/play", params={"device_id": SPOTIFY_DEVICE_ID})
     if resp.status_code not in (200, 204):
         raise RuntimeError(f"Resume failed: {resp.status_code} – {resp.text}")
 
 
-def spotify_play(song_query: str, spotify_token: str):
-    """Play a song on Spotify"""
-
-    headers = {"Authorization": f"Bearer {spotify_token}", "Content-Type": "application/json"}
-
-    # Search track
-    search_resp = requests.get(
-        "https://api.spotify.com/v1/search",
-        headers=headers,
-        params={"q": song_query, "type": "track", "limit": 1}
-    )
+def search_track(song_query: str):
+    """Best Spotify match for a search, None when nothing matches"""
+    search_resp = spotify_api("GET", "/search", params={"q": song_query, "type": "track", "limit": 1})
+    if search_resp.status_code != 200:
+        raise RuntimeError(f"Search failed: {search_resp.status_code} – {search_resp.text}")
     tracks = search_resp.json().get("tracks", {}).get("items", [])
-    if not tracks:
-        raise RuntimeError("No matching track found: {song_query}")
+    return tracks[0] if tracks else None
 
-    track = tracks[0]
 
-    # Play track
-    play_resp = requests.put(
-        "https://api.spotify.com/v1/me/player/play",
-        headers=headers,
+def play_track(uri: str):
+    """Start a resolved track, a single request at play time"""
+    play_resp = spotify_api(
+        "PUT", "/me/player/play",
         params={"device_id": SPOTIFY_DEVICE_ID},
-        json={"uris": [track["uri"]]}
+        json={"uris": [uri]}
     )
     if play_resp.status_code not in (200, 204):
         raise RuntimeError(f"Play failed: {play_resp.text}")
-    
-    return track
 
 
-def is_playing(spotify_token: str):
-    """Check if something is playing on Spotify"""
+def spotify_play(song_query: str):
+    """Play a song on Spotify"""
 
-    headers = {"Authorization": f"Bearer {spotify_token}"}
+    track = search_track(song_query)
+    if not track:
+        raise RuntimeError(f"No matching track found: {song_query}")
+
+    play_track(track["uri"])
+    return track
+
+
+def playback_state():
+    """Current playback as is_playing/uri/track/artist/progress_ms/duration_ms, {} if idle, None on errors"""
 
-    # Get current playback state; always return a boolean
     try:
-        response = requests.get("https://api.spotify.com/v1/me/player", headers=headers, timeout=10)
+        response = spotify_api("GET", "/me/player")
     except Exception as e:
-        log(f"[is_playing] Error fetching playback state: {e}")
-        return False
+        log(f"[playback_state] Error fetching playback state: {e}")
+        return None
 
     if response.status_code == 204:
         # No active device
-        return False
+        return {}
 
     if response.status_code != 200:
-        log(f"[is_playing] Spotify API error: {response.status_code} - {response.text}")
-        return False
+        log(f"[playback_state] Spotify API error: {response.status_code} - {response.text}")
+        return None
 
     try:
         player_data = response.json()
     except Exception as e:
-        log(f"[is_playing] Failed to parse Spotify response JSON: {e}")
-        return False
+        log(f"[playback_state] Failed to parse Spotify response JSON: {e}")
+        return None
+
+    item = player_data.get("item") or {}
+    return {
+        "is_playing": bool(player_data.get("is_playing", False)),
+        "uri": item.get("uri"),
+        "track": item.get("name"),
+        "artist": (item.get("artists") or [{}])[0].get("name"),
+        "progress_ms": player_data.get("progress_ms") or 0,
+        "duration_ms": item.get("duration_ms") or 0,
+    }
+
 
-    return bool(player_data.get("is_playing", False))
+def is_playing():
+    """Check if something is playing on Spotify"""
+    return bool((playback_state() or {}).get("is_playing"))
 
 
 # Individual workflow endpoints for debugging
@@ -319,7 +533,7 @@ def soundbar_setup_endpoint():
 
 @app.route('/token/exchange', methods=['POST'])
 def token_exchange_endpoint():
-    """Exchange refresh token for access token"""
+    """Current access token, exchanged only when the cached one expired"""
     try:
         token = exchange_token()
         return jsonify({"success": True, "access_token": token})
@@ -361,6 +575,20 @@ def tts_generate_endpoint():
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@app.route('/tts/speak', methods=['POST'])
+def tts_speak_endpoint():
+    """Speak text while it is synthesized, keeping the mp3 as filename"""
+    try:
+        data = request.get_json()
+        if not data or 'text' not in data:
+            return jsonify({"error": "Missing text in request body"}), 400
+
+        filename = stream_intro(data['text'], data.get('filename', 'intro.mp3'))
+        return jsonify({"success": True, "filename": filename})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
 @app.route('/audio/play', methods=['POST'])
 def play_audio_endpoint():
     """Play audio file"""
@@ -400,9 +628,7 @@ def spotify_play_endpoint():
         if not data or 'song_query' not in data:
             return jsonify({"error": "Missing song_query in request body"}), 400
         
-        spotify_token = exchange_token()
-
-        track = spotify_play(data['song_query'], spotify_token)
+        track = spotify_play(data['song_query'])
 
         return jsonify({
             "success": True,
@@ -416,9 +642,7 @@ def spotify_play_endpoint():
 @app.route('/spotify/pause', methods=['POST'])
 def spotify_pause_endpoint():
     try:
-        spotify_token = exchange_token()
-
-        spotify_pause(spotify_token)
+        spotify_pause()
 
         return jsonify({
             "success": True,
@@ -431,9 +655,7 @@ def spotify_pause_endpoint():
 def spotify_resume_endpoint():
     """Play song on Spotify"""
     try:
-        spotify_token = exchange_token()
-
-        spotify_resume(spotify_token)
+        spotify_resume()
 
         return jsonify({
             "success": True,
@@ -445,43 +667,79 @@ def spotify_resume_endpoint():
 def status_endpoint():
     """Endpoint to check if something is playing on Spotify"""
     try:
-        spotify_token = exchange_token()
-
-        result = {"is_playing": is_playing(spotify_token)}
+        state = playback_state()
+        if state is None:
+            raise RuntimeError("Could not fetch playback state")
+        result = {"is_playing": False, **state}
         
         return jsonify(result)
     except Exception as e:
         return jsonify({"is_playing": False, "error": str(e)}), 500
 
 
-def _precompute(prompt: str, previous_songs: List[str], previous_intros: List[str]) -> Tuple[str, str, str]:
-    """Do everything except the play_intro/spotify_play bits."""
+# Spotify search and TTS of one recommendation run side by side
+_precompute_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="precompute")
 
-    log(f"\n[_precompute] Starting precompute with prompt: {prompt}")
 
-    log(f"[_precompute] Exchanging Spotify token...")
-    spotify_token = exchange_token()
+def _precompute(prompt: str, previous_songs: List[str], previous_intros: List[str],
+                synthesize_intro: bool = True) -> Song:
+    """
+    Do everything except the play_intro/play_track bits.
+
+    Once the recommendation arrives, the Spotify search and the TTS run in
+    parallel. A recommendation Spotify can't find cancels its TTS and is asked
+    again. The intro is left to be streamed when synthesize_intro is False.
+    """
 
-    log(f"[_precompute] Requesting song recommendation from OpenAI...")
-    recommendation = get_song_from_prompt(prompt, previous_songs, previous_intros)
-    song_query = recommendation["songSearch"]
-    introduction = recommendation["introduction"]
+    log(f"\n[_precompute] Starting precompute with prompt: {prompt}")
 
-    log(f"[_precompute] 📝 Song recommendation: {song_query}")
-    log(f"[_precompute] 📝 Introduction text: {introduction}")
+    for attempt in range(RECOMMEND_ATTEMPTS):
+        log(f"[_precompute] Requesting song recommendation from OpenAI...")
+        recommendation = get_song_from_prompt(prompt, previous_songs, previous_intros)
+        song_query = recommendation["songSearch"]
+        introduction = recommendation["introduction"]
 
-    # record history
-    previous_songs.append(song_query)
-    previous_intros.append(introduction)
-    log(f"[_precompute] Recorded history (total songs: {len(previous_songs)})")
+        log(f"[_precompute] 📝 Song recommendation: {song_query}")
+        log(f"[_precompute] 📝 Introduction text: {introduction}")
 
-    # synthesize the spoken intro
-    log(f"[_precompute] Generating TTS audio from introduction...")
-    audio_file = speak_text(introduction)
-    log(f"[_precompute] ✅ TTS generated: {audio_file}")
+        cancel = threading.Event()
+        search = _precompute_pool.submit(search_track, song_query)
+        speech = _precompute_pool.submit(synthesize, introduction, cancel) if synthesize_intro else None
+        try:
+            track = search.result()
+        except Exception:
+            cancel.set()
+            raise
+        if not track:
+            cancel.set()
+            # Kept in the history so the next recommendation is a different song
+            previous_songs.append(song_query)
+            log(f"[_precompute] ⚠️ Not on Spotify, asking again: {song_query}")
+            continue
+
+        # record history
+        previous_songs.append(song_query)
+        previous_intros.append(introduction)
+        log(f"[_precompute] Recorded history (total songs: {len(previous_songs)})")
+
+        audio = None
+        if speech:
+            log(f"[_precompute] Waiting for TTS audio...")
+            audio = speech.result()
+            log(f"[_precompute] ✅ TTS generated: {len(audio)} bytes")
+
+        log(f"[_precompute] Precompute complete")
+        return Song(
+            query=song_query,
+            introduction=introduction,
+            uri=track["uri"],
+            name=track["name"],
+            artist=track["artists"][0]["name"],
+            duration_ms=track.get("duration_ms", 0),
+            audio=audio,
+        )
 
-    log(f"[_precompute] Precompute complete")
-    return song_query, audio_file, spotify_token
+    raise RuntimeError(f"No recommendation found on Spotify after {RECOMMEND_ATTEMPTS} attempts")
 
 
 # global variables to track the background task
@@ -490,60 +748,132 @@ _bg_thread = None
 _stop_event = threading.Event()
 
 
+def _produce(prompt: str, ready: queue.Queue, done: threading.Event):
+    """Keep DJ_LOOKAHEAD songs ready until the serve loop is done"""
+    previous_songs = []
+    previous_intros = []
+    first = True
+
+    while not done.is_set():
+        try:
+            # Nothing plays yet, so the first intro is streamed as it is synthesized
+            song = _precompute(prompt, previous_songs, previous_intros, synthesize_intro=not first)
+        except Exception as e:
+            log(f"[_produce] ❌ Precompute failed, retrying in 10s: {e}")
+            done.wait(10)
+            continue
+        first = False
+
+        # Blocks while the queue is full, the intros held in memory stay bounded
+        while not done.is_set():
+            try:
+                ready.put(song, timeout=1)
+                log(f"[_produce] ✅ Ready: {song.query} ({ready.qsize()}/{DJ_LOOKAHEAD} queued)")
+                break
+            except queue.Full:
+                pass
+
+    log(f"[_produce] Producer ended")
+
+
+def _wait_for_track_end(song: Song):
+    """
+    Sleep until the track is expected to end instead of polling throughout.
+
+    Each check reschedules the next one for the remaining time from
+    progress_ms and duration_ms, re-syncing every DJ_RESYNC seconds so seeks
+    are noticed. A different track means a skip, a pause is checked every
+    DJ_PAUSED_POLL seconds until playback resumes.
+    """
+    started_at = time.monotonic()
+    expected_end = None  # monotonic time the track should end, once seen playing
+    checks = 0
+
+    while not _stop_event.is_set():
+        state = playback_state()
+        checks += 1
+        now = time.monotonic()
+
+        if state is None:
+            # Spotify unreachable, trust the last known schedule
+            expected_end = expected_end or started_at + song.duration_ms / 1000
+            if now >= expected_end:
+                break
+            _stop_event.wait(min(expected_end - now, DJ_RESYNC))
+            continue
+
+        if state.get("uri") != song.uri:
+            if expected_end is None and now - started_at < 10:
+                # The play request hasn't reached the device yet
+                _stop_event.wait(1)
+                continue
+            log(f"[_wait_for_track_end] Now on {state.get('track')}, track skipped or ended")
+            break
+
+        remaining = (state["duration_ms"] - state["progress_ms"]) / 1000
+        if not state["is_playing"]:
+            # Spotify stops at the start or the very end of a finished track
+            if expected_end is not None and (state["progress_ms"] == 0 or remaining < 2):
+                break
+            log(f"[_wait_for_track_end] ⏸️ Paused, checking again in {DJ_PAUSED_POLL:g}s")
+            _stop_event.wait(DJ_PAUSED_POLL)
+            continue
+
+        expected_end = now + remaining
+        _stop_event.wait(max(0.25, min(remaining, DJ_RESYNC)))
+
+    log(f"[_wait_for_track_end] Track done after {checks} playback checks")
+
+
 def _serve_loop(prompt: str):
     """Infinifely fetch songs from the prompt and serve them"""
 
     log(f"\n🎵 [_serve_loop] Starting serve loop with prompt: {prompt}")
     _stop_event.clear()
-    previous_songs = []
-    previous_intros = []
 
     log(f"[_serve_loop] Setting up soundbar...")
     setup_soundbar()
 
-    song, audio_file, token = _precompute(prompt, previous_songs, previous_intros)
-    done = True
+    # Songs are prepared ahead by a producer, a slow LLM or TTS call only shortens the queue
+    ready = queue.Queue(maxsize=DJ_LOOKAHEAD)
+    done = threading.Event()
+    threading.Thread(target=_produce, args=(prompt, ready, done), name="dj-producer", daemon=True).start()
 
-    while not _stop_event.is_set():
-        try:
-            log(f"\n[_serve_loop] 🔊 Playing intro: {audio_file}")
-            play_intro(audio_file)
+    try:
+        while not _stop_event.is_set():
+            try:
+                song = ready.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if song.audio:
+                log(f"\n[_serve_loop] 🔊 Playing intro for: {song.query}")
+                play_intro(song.audio)
+            else:
+                log(f"\n[_serve_loop] 🔊 Streaming intro for: {song.query}")
+                stream_intro(song.introduction, "intro.mp3")
             log(f"[_serve_loop] ✅ Intro playback complete")
 
-            time.sleep(3) # Sleeping between intro and music
-            log(f"[_serve_loop] ⏳ Waited 3s before starting Spotify...")
-
-            log(f"[_serve_loop] 🎶 Starting Spotify playback: {song}")
-            spotify_play(song, token)
-            log(f"[_serve_loop] ✅ Spotify playback started")
-
-            time.sleep(30) # Waiting to start playing
-            log(f"[_serve_loop] ⏳ Waited 30s for song to start...")
+            time.sleep(DJ_INTRO_GAP) # Sleeping between intro and music
 
-            done = False
+            log(f"[_serve_loop] 🎶 Starting Spotify playback: {song.name} by {song.artist}")
+            play_track(song.uri)
+            log(f"[_serve_loop] ✅ Spotify playback started ({ready.qsize()} more ready)")
 
-            while is_playing(token):
-                if _stop_event.is_set():
-                    log(f"[_serve_loop] 🛑 Stop event received, breaking playback loop")
+            _wait_for_track_end(song)
+            if _stop_event.is_set():
+                log(f"[_serve_loop] 🛑 Stop event received, breaking playback loop")
 
-                    # TODO: Spotify stop
-                    break
-                if not done:
-                    log(f"[_serve_loop] Song still playing, precomputing next song...")
-                    song, audio_file, token = _precompute(prompt, previous_songs, previous_intros)
-                    done = True
-                    log(f"[_serve_loop] ✅ Next song precomputed and ready")
+                # TODO: Spotify stop
+                break
+            log(f"[_serve_loop] Song finished, next one starts now")
 
-                time.sleep(2)
-
-            log(f"[_serve_loop] Song finished, waiting before next cycle...")
-            time.sleep(5)
-
-        except Exception as e:
-            import traceback
-            log(f"\n❌ [_serve_loop] Serve failed: {e}")
-            traceback.print_exc()
-            break
+    except Exception as e:
+        import traceback
+        log(f"\n❌ [_serve_loop] Serve failed: {e}")
+        traceback.print_exc()
+    finally:
+        done.set()
 
     log(f"\n🛑 [_serve_loop] Serve loop ended")
 